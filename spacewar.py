@@ -12,22 +12,27 @@ to avoid falling into it.
 
 TODO:
 Abstract code in main loop into functions.
-Load all images at beginning
 Ditch numpy?
 ships explode
 2nd ship
 fullscreen mode
 title/menu
-AI
 Make ships reflect sun
 ship mouse-controllable
 """
 
 ### Import Modules
 
-import pygame
+import timeit
+STARTED = timeit.default_timer()  # Before anything else, so the startup report counts the imports
+
+import optparse, pygame
 
 from spacewar_func import *  # My Spacewar functions
+from spacewar_replay import Recorder
+from spacewar_ai import HeuristicAI
+from spacewar_headless import KeyState
+from spacewar_scenario import load, configure, build
 
 
 ### Initialization
@@ -41,93 +46,131 @@ if not pygame.mixer:
 
 
 
-def main():
+def main(trace=None, record=None, ai=False, startup=False, scenario=None):
     """this function is called when the program starts.
        It initializes everything it needs, then runs in
-       a loop until the function returns."""
+       a loop until the function returns.
+       If trace is a filename, every frame's timings are written to it at the end.
+       If record is, the keys pressed are, so the game can be replayed (see spacewar_replay).
+       If ai, the computer flies ship 2.
+       If scenario is a filename, the game is set up from it (see spacewar_scenario),
+       and the computer flies every ship that isn't a player's.
+       If startup, it quits after the first frame (once the sounds are in),
+       and prints how long each part of starting up took."""
 
     #Initialize Everything
-    pygame.init()
-    gamestate = GameState()
-    if not SOUND:
-        pygame.mixer.quit()
-    screen = pygame.display.set_mode((DISP_WIDTH, DISP_HEIGHT))
+    # Only the display, rather than pygame.init(): the mixer gets started
+    # along with loading the sounds, and fonts when the profiler needs one.
+    timer = StartupTimer(STARTED)
+    timer.lap('imports')
+    pygame.display.init()
+    if scenario:
+        scenario = load(scenario)
+        gamestate = GameState(configure(scenario))
+    else:
+        gamestate = GameState()
+    screen = pygame.display.set_mode((gamestate.config.DISP_WIDTH, gamestate.config.DISP_HEIGHT))
     pygame.display.set_caption('Spacewar')
+    timer.lap('display')
+
+    # The sounds load in the background while everything else gets ready
+    # (until then, they're silent).
+    sounds = gamestate.load_sounds(background=True, done=lambda: timer.done('sounds'))
 
     # Create and display the backgound
-    background = pygame.Surface(screen.get_size())
-    background = load_image("starfield.jpg")[0]
-    screen.blit(background, (0, 0))
-    pygame.display.flip()
+    gamestate.assets.preload(gamestate.config.SHIP_ROTATE) # Now that there's a display to convert them for
+    background = gamestate.load_image("starfield.jpg")[0]
+    if scenario:
+        # The world can be bigger than the screen: arrows pan, - and = zoom, Home shows all of it
+        camera = Camera(screen.get_size(), gamestate.world.area)
+        camera.fit()
+        renderer = CameraRenderer(screen, background, camera)
+    else:
+        renderer = Renderer(screen, background)
+    renderer.start()
+    gamestate.profiler = Profiler(keep=bool(trace)) # F3 shows it. Every frame is only kept if it's going to be saved
+    timer.lap('images')
 
     ### Prepare Game Objects
     clock = pygame.time.Clock()
-    gamestate.soundplay["drip"]  = load_sound('drip.wav')
-    gamestate.soundplay["bam"]   = load_sound('bam.wav')
-    gamestate.soundplay["bonk"]  = load_sound('bonk.wav')
-    gamestate.soundplay["doink"] = load_sound('doink.wav')
-    ship1 = Ship(gamestate,load_image("ship.png"),(200,200),SHIP1_KEYS,(10,10),(-3,  3))
-    ship2 = Ship(gamestate,load_image("ship.png"),(600,400),SHIP2_KEYS,(410,10),( 3, -3))
-    if SUN_MASS > 0:
-        Sun(gamestate,load_image("ball.png"),(400,300))
+    if scenario:
+        ships, players = build(gamestate, scenario)
+        renderer.huds = players
+        computer = [ship for ship in ships if ship not in players]
+    else:
+        ships = players = gamestate.new_game()
+        computer = []
+    if ai and players[1]:
+        computer.append(players[1])
+    brain = ai or HeuristicAI()  # Flies the computer's ships (a scenario's have to fly even without --ai)
+    recorder = Recorder(gamestate.config)
+    # The game goes at TICK_RATE ticks a second, whatever the frame rate
+    timestep = FixedTimestep(gamestate.config.TICK_RATE, gamestate.config.MAX_TICKS_PER_FRAME)
 
     # Main Loop
     mainloop = True
     while mainloop:
-        clock.tick(FPS)
+        clock.tick(gamestate.config.FPS)
+        gamestate.profiler.begin()
 
         # Handle Input Events
         for event in pygame.event.get():
             if event.type == pygame.locals.QUIT or (event.type == pygame.locals.KEYDOWN and event.key == pygame.locals.K_ESCAPE):
                 mainloop = False
-            keystate = pygame.key.get_pressed()
-
-        ship1.getinput(gamestate, keystate)
-        ship2.getinput(gamestate, keystate)
-
-        # This loop compares every unique pair of sprites once and only
-        # once for collision detection. I suspect there's a more
-        # elegant way to do it.
-        for i in xrange(len(gamestate.bodys.sprites()) - 1 ):
-            for j in xrange(i + 1,len(gamestate.bodys.sprites())):
-                if gamestate.bodys.sprites()[i].intersects(gamestate.bodys.sprites()[j]):
-                    gamestate.bodys.sprites()[i].collide(gamestate, gamestate.bodys.sprites()[j])
-        # Sprites should only be kill()ed in their updates-- if they're killed
-        # in above collision, we get a nasty error.
-
-
-        # The beauty here is that extremely close objects have no pull, so it's okay that x pulls x sometimes.
-        # And, unlike above, we want both x pulling y and y pulling x. So the code is prettier.
-
-        for x in gamestate.bodys.sprites():
-            map(x.pulledby,gamestate.bodys.sprites())
-
-        # update: change velocities according to accelerations, postitions according to velocities, etc.
-        # flames and meters don't need to be updated-- Ship.update() handles it when necessary.
-        gamestate.bodys.update(gamestate)
-        gamestate.explosions.update(gamestate)
-
-        # Draw sprites, meters
-        for ship in gamestate.ships.sprites():
-            ship.meter.draw(screen) # Draw meters
-        gamestate.flames.draw(screen)
-        gamestate.bodys.draw(screen)
-        gamestate.explosions.draw(screen)
-
-        # Paste it onto the screen
-        pygame.display.flip()
-
-        # Clear sprites, meters
-        for ship in gamestate.ships.sprites():
-            ship.meter.clear(screen,background) # Clear meters
-        gamestate.flames.clear(screen,background)
-        gamestate.bodys.clear(screen,background)
-        # explosions.clear(screen,background)
-        screen.blit(background, (0, 0)) # Slower, but more complete
-
+            if event.type == pygame.locals.KEYDOWN and event.key == pygame.locals.K_F3:
+                if renderer.overlay: renderer.overlay = None
+                else: renderer.overlay = gamestate.profiler
+            if scenario and event.type == pygame.locals.KEYDOWN:
+                if event.key == pygame.locals.K_EQUALS: camera.zoom(1)
+                if event.key == pygame.locals.K_MINUS: camera.zoom(-1)
+                if event.key == pygame.locals.K_HOME: camera.fit()
+        keystate = pygame.key.get_pressed()
+        if scenario:
+            camera.pan(15 * (keystate[pygame.locals.K_RIGHT] - keystate[pygame.locals.K_LEFT]),
+                       15 * (keystate[pygame.locals.K_DOWN] - keystate[pygame.locals.K_UP]))
+        if computer:
+            # The computer presses its ships' keys (in a copy of the keyboard we can write on),
+            # all of them in one go
+            keystate = KeyState((key, keystate[key]) for key in recorder.keys)
+            fleet = [(gamestate, ship) for ship in computer if ship.alive()]
+            brain.fly(fleet, [keystate] * len(fleet))
+        gamestate.profiler.lap('events')
+
+        # As many ticks as it's time for: none, if frames are coming quicker than ticks
+        ticks = timestep.ticks()
+        for tick in xrange(ticks):
+            if record: recorder.record(keystate)
+            gamestate.step(keystate)
+        gamestate.profiler.count('ticks', ticks)
+
+        # Draw sprites and meters (part of the way to where they're going next),
+        # and paste the parts that changed onto the screen
+        renderer.draw(gamestate, timestep.alpha)
+        gamestate.profiler.endframe()
+
+        if startup:
+            timer.lap('first frame')
+            sounds.join()
+            print '\n'.join(timer.report())
+            mainloop = False
+
+    if trace:
+        gamestate.profiler.dump(trace)
+    if record:
+        recorder.save(record, gamestate)
 
 
 if __name__ == '__main__':
-    main()
+    # python spacewar.py [trace.csv] [--record session.swr] [--ai] [--startup] [--scenario armada.json]
+    parser = optparse.OptionParser(usage='%prog [trace.csv] [--record session.swr] [--ai] [--startup] [--scenario file.json]')
+    parser.add_option('--record', help='save the keys pressed, to play back with spacewar_replay.py')
+    parser.add_option('--ai', action='store_true', help='the computer flies ship 2')
+    parser.add_option('--startup', action='store_true', help='just show how long starting up takes')
+    parser.add_option('--scenario', help='set the game up from a file, like scenarios/armada.json')
+    options, args = parser.parse_args()
+    if options.scenario and options.record:
+        parser.error("scenarios can't be recorded (yet)")
+    main(*args[:1], record=options.record, ai=options.ai and HeuristicAI(), startup=options.startup,
+         scenario=options.scenario)
     pygame.quit() # Needed when running from IDLE or PyScripter
 
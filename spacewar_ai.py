@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+
+"""Computer players for Spacewar.
+
+    python spacewar_ai.py [matches] [max ticks]
+
+A Controller flies ships by deciding, each tick, the same four things a
+player's keys do: thrust, turn left, turn right, shoot. It presses the
+ship's keys in a keystate, so Ship.getinput() doesn't know the difference,
+and games it plays can be recorded and replayed like anyone else's.
+
+Controllers decide for a whole fleet of ships at once -- every ship in
+every game being played -- so HeuristicAI works its aim out for all of
+them in one go with numpy, rather than one ship at a time. That's what
+makes AI-vs-AI matches cheap: run from the command line, this plays lots
+of headless matches side by side, one batch of decisions per tick."""
+
+import random, sys, time
+
+import numpy
+
+from spacewar_func import *
+from spacewar_headless import KeyState, headless_gamestate, outcome
+
+# A decision is one row of four: which of (thrust, left, right, shoot) to hold down.
+THRUST, LEFT, RIGHT, SHOOT = range(4)
+
+
+def press(keystate, ship, decision):
+    """Hold down ship's keys in keystate as decision says."""
+    keystate[ship.thrustkey] = int(decision[THRUST])
+    keystate[ship.leftkey]   = int(decision[LEFT])
+    keystate[ship.rightkey]  = int(decision[RIGHT])
+    keystate[ship.shootkey]  = int(decision[SHOOT])
+
+
+class Controller:
+    """Decides what a fleet of ships does. Subclasses fill in decide().
+
+    A Controller is a pilot too (see spacewar_headless), so it can fly a
+    ship in play() on its own, but that's a batch of one every tick."""
+
+    def decide(self, fleet):
+        """fleet is a list of (gamestate, ship). Returns an array of decisions, a row per ship."""
+        raise NotImplementedError
+
+    def fly(self, fleet, keystates):
+        """Decide for every ship in fleet, and press the keys in keystates[n] for fleet[n]."""
+        if not fleet:
+            return
+        for (gamestate, ship), keystate, decision in zip(fleet, keystates, self.decide(fleet)):
+            press(keystate, ship, decision)
+
+    def __call__(self, ship, gamestate, keystate):
+        self.fly([(gamestate, ship)], [keystate])
+
+### End class Controller
+
+
+class HeuristicAI(Controller):
+    """Turns to where the enemy will be when a shot gets there, and shoots.
+
+    The aim leads the target: a shot keeps the velocity of the ship that
+    fired it, and both the shot and the target fall towards the suns while
+    it's on its way, so the time of flight is worked out over a few rounds,
+    taking the difference in the suns' pull into account. Before any of
+    that, if the ship is going to pass within margin of a sun in the next
+    lookahead ticks, it turns side-on to the sun and burns out of there.
+    Otherwise it thrusts towards the enemy when it's far off and slow.
+
+    Each ship goes for the nearest other ship in its own game."""
+
+    def __init__(self, lookahead=30, margin=30, cruise=2.0, far=200, rounds=4):
+        self.lookahead = lookahead
+        self.margin = margin
+        self.cruise = cruise  # Don't thrust at the enemy when going faster than this
+        self.far = far
+        self.rounds = rounds
+
+    def decide(self, fleet):
+        n = len(fleet)
+        p, v, a = numpy.zeros((n, 2)), numpy.zeros((n, 2)), numpy.zeros((n, 2))
+        tp, tv, ta = numpy.zeros((n, 2)), numpy.zeros((n, 2)), numpy.zeros((n, 2))
+        radius, tradius = numpy.zeros(n), numpy.zeros(n)
+        angle, ready, target = numpy.zeros(n), numpy.zeros(n, dtype=bool), numpy.zeros(n, dtype=bool)
+        settings = numpy.zeros((n, 4))  # SHOT_SPEED, SHOT_LIFESPAN, SHIP_ROTATE, walls
+        size = numpy.ones((n, 2))
+        suns = []  # For each ship: (positions, masses * GRAV_CONST, radii) of the suns in its game
+
+        # Gather everything up, a row per ship. The suns' rows are shared by
+        # every ship in the same game.
+        games = {}
+        for k, (gamestate, ship) in enumerate(fleet):
+            world, config = gamestate.world, gamestate.config
+            if id(gamestate) not in games:
+                heavy = numpy.flatnonzero(world.alive & (world.kind == Sun.kind))
+                games[id(gamestate)] = ((world.p[heavy], config.GRAV_CONST * world.mass[heavy], world.radius[heavy]),
+                                        self.enemies(gamestate))
+            game_suns, enemies = games[id(gamestate)]
+            suns.append(game_suns)
+            slot = ship.slot
+            p[k], v[k], radius[k] = world.p[slot], world.v[slot], world.radius[slot]
+            angle[k] = ship.angle
+            ready[k] = not ship.cantshoot
+            settings[k] = (config.SHOT_SPEED, config.SHOT_LIFESPAN, config.SHIP_ROTATE, config.WALLS)
+            size[k] = (world.area.width, world.area.height)
+            enemy = enemies.get(ship)
+            if enemy is not None:
+                tp[k], tv[k], tradius[k] = world.p[enemy.slot], world.v[enemy.slot], world.radius[enemy.slot]
+                target[k] = True
+            else:
+                tp[k] = p[k]
+        shot_speed, lifespan, rotate, walls = settings.T
+
+        # The suns, padded out to the same number for every ship (with
+        # massless ones far away), so they can all be done at once.
+        most = max([len(s[1]) for s in suns] + [1])
+        sp = numpy.zeros((n, most, 2)) + 1e9
+        sgm = numpy.zeros((n, most))
+        sr = numpy.zeros((n, most))
+        for k, (spk, gmk, srk) in enumerate(suns):
+            sp[k, :len(gmk)], sgm[k, :len(gmk)], sr[k, :len(gmk)] = spk, gmk, srk
+        a = self.pull(p, sp, sgm)
+        ta = self.pull(tp, sp, sgm)
+
+        # Where to aim: keep working out how long a shot takes to get to
+        # where the target will be by then.
+        r = tp - p
+        toroidal = walls == 0
+        r[toroidal] -= size[toroidal] * numpy.round(r[toroidal] / size[toroidal])
+        w, da = tv - v, ta - a
+        t = numpy.hypot(r[:, 0], r[:, 1]) / shot_speed
+        for k in xrange(self.rounds):
+            t = numpy.minimum(t, lifespan)
+            aim = r + w * t[:, None] + 0.5 * da * (t * t)[:, None]
+            t = numpy.hypot(aim[:, 0], aim[:, 1]) / shot_speed
+        distance = numpy.hypot(r[:, 0], r[:, 1])
+
+        # Heading for a sun? Find the closest each sun gets on the ship's
+        # present course over the next lookahead ticks.
+        rs = p[:, None, :] - sp  # From each sun to the ship
+        speed2 = numpy.maximum((v * v).sum(1), 1e-9)
+        tc = numpy.clip(-(rs * v[:, None, :]).sum(2) / speed2[:, None], 0, self.lookahead)
+        closest = rs + v[:, None, :] * tc[:, :, None]
+        danger = numpy.hypot(closest[..., 0], closest[..., 1]) - sr - radius[:, None] < self.margin
+        danger = danger & (sgm > 0)
+        evading = danger.any(1)
+        worst = numpy.argmin(numpy.where(danger, tc, numpy.inf), 1)
+        out = rs[numpy.arange(n), worst]
+        out = out / numpy.maximum(numpy.hypot(out[:, 0], out[:, 1]), 1e-9)[:, None]
+        along = numpy.column_stack((-out[:, 1], out[:, 0]))
+        along[(along * v).sum(1) < 0] *= -1  # Whichever way round we're already going
+        escape = out + along
+
+        # Which way to turn. Angles are in degrees, anticlockwise on the
+        # screen (y goes down), like Ship.thrustvec().
+        want = numpy.where(evading[:, None], escape, aim)
+        wanted = numpy.degrees(numpy.arctan2(-want[:, 1], want[:, 0]))
+        off = (wanted - angle + 180) % 360 - 180
+        turn_left = off > rotate / 2
+        turn_right = off < -rotate / 2
+        lined_up = numpy.abs(off) <= numpy.maximum(rotate / 2, numpy.degrees(numpy.arctan2(tradius, distance)))
+
+        decisions = numpy.zeros((n, 4), dtype=bool)
+        decisions[:, LEFT] = turn_left
+        decisions[:, RIGHT] = turn_right
+        decisions[:, THRUST] = numpy.where(evading, numpy.abs(off) < 45,
+                                           (numpy.abs(off) < 30) & (distance > self.far) & (speed2 < self.cruise ** 2) & target)
+        decisions[:, SHOOT] = ~evading & target & ready & lined_up & (t < lifespan)
+        return decisions
+
+    @staticmethod
+    def enemies(gamestate):
+        """Return a dict: each living ship in gamestate -> the nearest other one (if there is one).
+
+        All the distances at once: with lots of ships, going through every
+        pair one at a time takes longer than everything else put together."""
+        ships = gamestate.ships.sprites()
+        if len(ships) < 2:
+            return {}
+        world = gamestate.world
+        p = world.p[[ship.slot for ship in ships]]
+        r = p[:, None, :] - p
+        d = (r * r).sum(2)
+        d[numpy.diag_indices(len(ships))] = numpy.inf
+        return dict(zip(ships, [ships[n] for n in d.argmin(1).tolist()]))  # The first, if two are as near
+
+    @staticmethod
+    def pull(p, sp, sgm):
+        """The suns' pull on each point p[n]: the sum of sgm[n] * r / |r|^2 over the suns, like Body.pulledby()."""
+        r = sp - p[:, None, :]
+        d2 = numpy.maximum((r * r).sum(2), 1e-9)
+        return ((sgm / d2)[:, :, None] * r).sum(1)
+
+### End class HeuristicAI
+
+
+def duels(matches, controllers=None, seed=0, maxticks=10000, config=None):
+    """Play matches headless games side by side, each ship flown by a Controller.
+
+    controllers is a pair: one for every ship 1, one for every ship 2
+    (default: HeuristicAI for both). Each tick, each controller decides for
+    all of its ships in all the games still going at once. The games are
+    all alike, except that each one's ships start off moving a little
+    differently (from seed). Returns a list of results like
+    spacewar_headless.play()'s."""
+    if controllers is None:
+        controllers = (HeuristicAI(), HeuristicAI())
+    rand = random.Random(seed)
+    games = []
+    for k in xrange(matches):
+        gamestate = headless_gamestate(config)
+        ships = gamestate.new_game()
+        for ship in ships:
+            ship.v = ship.v + (rand.uniform(-1, 1), rand.uniform(-1, 1))
+        games.append((gamestate, ships, KeyState()))
+    results = [None] * matches
+    ticks = 0
+    while ticks < maxticks:
+        going = [k for k in xrange(matches) if results[k] is None]
+        if not going:
+            break
+        for n, controller in enumerate(controllers):
+            fleet, keystates = [], []
+            for k in going:
+                gamestate, ships, keystate = games[k]
+                fleet.append((gamestate, ships[n]))
+                keystates.append(keystate)
+            controller.fly(fleet, keystates)
+        ticks = ticks + 1
+        for k in going:
+            gamestate, ships, keystate = games[k]
+            gamestate.step(keystate)
+            if len(gamestate.ships) < len(ships) or ticks == maxticks:
+                results[k] = outcome(ships, ticks)
+    return results
+
+
+if __name__ == '__main__':
+    matches = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    maxticks = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    start = time.time()
+    results = duels(matches, maxticks=maxticks)
+    elapsed = time.time() - start
+    ticks = sum(result['ticks'] for result in results)
+    wins = [sum(1 for result in results if result['winner'] == w) for w in (1, 2, 0)]
+    print 'ship 1 won %d, ship 2 won %d, %d draws' % tuple(wins)
+    print '%d matches, %d ticks in %.2fs (%.0f ticks/s)' % (matches, ticks, elapsed, ticks / elapsed)
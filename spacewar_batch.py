@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+"""Play lots of headless Spacewar matches at once, sweeping the game's constants.
+
+    python spacewar_batch.py results.jsonl --seeds 100 --set SUN_MASS=1000,2500 --set THRUST=0.1,0.2
+
+Every combination of the --set values is played once per seed, spread over
+a pool of worker processes (one per core by default). Each finished match
+is written to the results file straight away as one line of JSON, so a run
+that gets interrupted can just be started again: matches already in the
+file are skipped."""
+
+import itertools, json, multiprocessing, optparse, os, sys, time
+
+from spacewar_func import Config
+import spacewar_headless
+
+# The settings a sweep may change (see Config).
+TUNABLE = ('GRAV_CONST', 'SUN_MASS', 'THRUST', 'SHOT_SPEED', 'SHOT_DELAY', 'SHOT_LIFESPAN',
+           'SHOT_PAIN', 'CRASH_PAIN', 'START_ENERGY', 'MAXSPEED', 'SHIP_ROTATE', 'WALLS', 'GRAV_THRESHOLD',
+           'SWEPT', 'INTEGRATOR', 'SUBSTEPS')
+
+
+def grid(sweeps):
+    """Every combination of the values in sweeps, a dict of name -> list of values. Returns a list of dicts."""
+    names = sorted(sweeps)
+    return [dict(zip(names, values)) for values in itertools.product(*[sweeps[name] for name in names])]
+
+def match_key(params, seed):
+    return json.dumps(params, sort_keys=True), seed
+
+def run_match(job):
+    """Play one match in this process. job is (params, seed, maxticks)."""
+    params, seed, maxticks = job
+    config = Config(**dict((str(name), value) for name, value in params.items()))
+    result = spacewar_headless.play(seed=seed, maxticks=maxticks, config=config)
+    result['params'] = params
+    result['seed'] = seed
+    return result
+
+def finished(filename):
+    """Return the keys of the matches already in a results file.
+
+    If the last line was only half written (we got killed), it's cut off."""
+    done = set()
+    if not os.path.exists(filename):
+        return done
+    with open(filename, 'r+') as f:
+        good = 0
+        for line in iter(f.readline, ''):
+            if not line.endswith('\n'):
+                break
+            try:
+                result = json.loads(line)
+            except ValueError:
+                break
+            done.add(match_key(result['params'], result['seed']))
+            good = f.tell()
+        f.truncate(good)
+    return done
+
+def run_batch(filename, sweeps, seeds, maxticks=10000, workers=None, chunksize=4):
+    """Play every match in the sweep not already in filename. Returns how many were played."""
+    done = finished(filename)
+    jobs = [(params, seed, maxticks) for params in grid(sweeps) for seed in seeds
+            if match_key(params, seed) not in done]
+    if not jobs:
+        return 0
+    pool = multiprocessing.Pool(workers)
+    try:
+        with open(filename, 'a') as out:
+            for result in pool.imap_unordered(run_match, jobs, chunksize):
+                out.write(json.dumps(result, sort_keys=True, separators=(',', ':')) + '\n')
+                out.flush()
+    finally:
+        pool.terminate()
+    return len(jobs)
+
+def parse_sweep(option, opt, value, parser):
+    name, values = value.split('=', 1)
+    if name not in TUNABLE:
+        raise optparse.OptionValueError('%s can\'t be swept; try one of %s' % (name, ', '.join(TUNABLE)))
+    parser.values.sweeps[name] = [json.loads(v) for v in values.split(',')]
+
+
+if __name__ == '__main__':
+    parser = optparse.OptionParser(usage='%prog RESULTS [options]')
+    parser.set_defaults(sweeps={})
+    parser.add_option('--set', action='callback', callback=parse_sweep, type='string', metavar='NAME=V1,V2,...',
+                      help='values to try for one of: ' + ', '.join(TUNABLE))
+    parser.add_option('--seeds', type='int', default=10, help='matches per combination [%default]')
+    parser.add_option('--maxticks', type='int', default=10000, help='a match is a draw after this [%default]')
+    parser.add_option('--workers', type='int', help='processes [one per core]')
+    options, args = parser.parse_args()
+    if len(args) != 1:
+        parser.error('where should the results go?')
+
+    start = time.time()
+    played = run_batch(args[0], options.sweeps, range(options.seeds), options.maxticks, options.workers)
+    print '%d matches in %.1fs' % (played, time.time() - start)
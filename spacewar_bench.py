@@ -0,0 +1,467 @@
+#!/usr/bin/env python
+
+"""Benchmarks for my Spacewar program.
+
+    python spacewar_bench.py [--out results.json] [--baseline baseline.json] [--only swarm]
+    python spacewar_bench.py --compare [number of bodies ...]
+    python spacewar_bench.py --memory
+    python spacewar_bench.py --integrators [ticks]
+    python spacewar_bench.py --startup [runs]
+
+The first form runs the scenario suite: scripted headless games (an idle
+duel, both ships firing nonstop, and swarms of 100 to 10000 shots with and
+without the sun and walls), each for a fixed number of ticks from a fixed
+seed, in a process of its own -- over and over, for a couple of seconds,
+keeping the quickest run. For each one it measures ticks per second,
+milliseconds per tick in each phase of GameState.step() ("update" is the
+Ship/Shot.update() business, "move" is the World moving every Body), the
+peak memory of the process, and how many more garbage-collected objects
+there are per tick. Python 2 can't count allocations directly; a
+number above zero there means something is piling up.
+
+Results can be saved with --out, and checked against saved results with
+--baseline: any scenario whose tick rate has dropped by more than the
+tolerance (30%) is run again, twice more if need be, and if it's still
+that much slower it's a regression, and the exit status is 1. A baseline
+only means anything on the machine it was made on, so there isn't one in
+the repository. To check a change, run this on the code before it:
+
+    python spacewar_bench.py --out baseline.json
+
+and this on the code after it:
+
+    python spacewar_bench.py --baseline baseline.json
+
+Every swarm lasts the whole run (the ships keep out of its way); if more
+than 2% of the Bodys are gone by the end, it stops with an AssertionError.
+
+The second form compares the broad phases against the nested collision
+loop main() used to have. That loop is so slow for big crowds that it's
+only run for about a second, and the full time is estimated from how many
+pairs it got through (marked with a ~). Then the gravity solvers, with how
+many pulls each one had to work out, and whether all pairs or barnes-hut
+was quicker at that size (barnes-hut only pays off for big crowds).
+
+The third form shows how many bytes each kind of sprite takes up: the
+object itself, the dicts and Rects hanging off it, and (for Bodys) its
+row of the World's arrays. Images are shared, so they aren't counted.
+
+The fourth puts bodies in orbit round a sun and runs them with each
+integrator, showing how far the total energy drifts (as a fraction of the
+kinetic energy they started with), and what it costs.
+
+The fifth times starting up, each time in a fresh process: importing the
+headless game and playing its first tick (the median of a few runs), then
+the windowed game's own report (spacewar.py --startup, with SDL's dummy
+drivers if there's no display)."""
+
+import gc, json, multiprocessing, optparse, os, random, resource, subprocess, sys, timeit
+
+import pygame
+
+from spacewar_func import *
+from spacewar_headless import KeyState
+from spacewar_physics import energy
+
+
+WARMUP = 5  # Ticks played before the timing starts
+TOLERANCE = 0.3  # How much slower a scenario has to be to count as a regression (see confirmed_regressions())
+
+def scenario(name, shots=0, sun=True, walls=1, fire=False, ticks=200, seed=0):
+    return {'name': name, 'shots': shots, 'sun': sun, 'walls': walls, 'fire': fire, 'ticks': ticks, 'seed': seed}
+
+SCENARIOS = [scenario('idle duel'), scenario('sustained fire', fire=True, ticks=500)]
+for n in (100, 1000, 10000):
+    for sun in (True, False):
+        for walls in (1, 0):
+            SCENARIOS.append(scenario('swarm %d%s%s' % (n, sun and ' sun' or '', walls and ' walls' or ''),
+                                      shots=n, sun=sun, walls=walls, ticks=max(20, 20000 // n)))
+
+def build(spec):
+    """Set up a scenario. Returns the GameState and the keys held down throughout."""
+    config = Config(WALLS=spec['walls'], SUN_MASS=spec['sun'] and SUN_MASS or 0,
+                    START_ENERGY=10**6,  # Nobody dies, so every tick has the same work to do
+                    POOL_SIZE=max(POOL_SIZE, spec['shots']))
+    gamestate = GameState(config, headless=True)
+    gamestate.load_sounds()
+    ships = gamestate.new_game()
+    if spec['shots']:
+        swarm(gamestate, ships, spec['shots'], spec['ticks'] + WARMUP, random.Random(spec['seed']))
+    keystate = KeyState()
+    if spec['fire']:
+        for ship in ships:
+            keystate[ship.shootkey] = keystate[ship.leftkey] = 1
+    return gamestate, keystate
+
+def swarm(gamestate, ships, n, ticks, rand):
+    """Put n shots in gamestate, where they'll all last for ticks ticks.
+
+    Otherwise the later ticks time a smaller swarm than the name says (and
+    every round a different one). The shots start out too far apart to reach
+    each other before the end, and the ships are moved out of their way.
+    Without a sun, the shots are on a grid, drifting slowly, and the ships
+    sit still in clearings of their own. With one, nothing at rest lasts:
+    its pull goes as 1/distance, so it swallows a shot from a screen away in
+    a hundred ticks. So everything goes round it on circular orbits (at the
+    same speed, whatever the distance, for a 1/distance pull), in rings that
+    all turn together: the shots on a ring evenly spaced, clear of the next
+    ring in and out, the sun, the edges, and the ring the ships are on."""
+    config, area = gamestate.config, gamestate.world.area
+    shot = gamestate.load_image("shot.png")[1].height / 2  # Radii
+    sun = gamestate.load_image("ball.png")[1].height / 2
+    center = area.center
+    spacing = math.sqrt(area.width * area.height / float(n))  # Squeezed up below, until there's room
+    places = []
+    if config.SUN_MASS:
+        speed = math.sqrt(config.GRAV_CONST * config.SUN_MASS)
+        lanes = []  # (radius, clearance) of the ships' orbits
+        for ship in ships:
+            x, y = ship.p[0] - center[0], ship.p[1] - center[1]
+            ship.v = (-y * speed / math.hypot(x, y), x * speed / math.hypot(x, y))
+            lanes.append((math.hypot(x, y), ship.radius + shot))
+        outer = min(area.width, area.height) / 2.0 - shot
+        while len(places) < n:
+            spacing = spacing * 0.99
+            places = []
+            r = sun + shot + spacing
+            while r <= outer:
+                if all(abs(r - lane) >= clearance + spacing for lane, clearance in lanes):
+                    count = int(2 * math.pi * r / spacing)
+                    places.extend((r * math.cos(2 * math.pi * k / count), r * math.sin(2 * math.pi * k / count))
+                                  for k in xrange(count))
+                r = r + spacing
+    else:
+        for ship in ships:
+            ship.v = (0, 0)
+        while len(places) < n:
+            spacing = spacing * 0.99
+            across, down = int((area.width - spacing) / 2.0 / spacing), int((area.height - spacing) / 2.0 / spacing)  # A gap at the edges too, for wrapping round
+            places = [(k * spacing, l * spacing) for k in xrange(-across, across + 1) for l in xrange(-down, down + 1)
+                      if all(math.hypot(center[0] + k * spacing - ship.p[0], center[1] + l * spacing - ship.p[1]) >=
+                             ship.radius + shot + spacing for ship in ships)]
+    drift = min(0.25, (spacing - 2 * shot) / (2.0 * ticks))  # Not enough to close the gaps
+    rand.shuffle(places)
+    for x, y in places[:n]:
+        if config.SUN_MASS:
+            v = (-y * speed / math.hypot(x, y), x * speed / math.hypot(x, y))
+        else:
+            v = (rand.uniform(-drift, drift), rand.uniform(-drift, drift))
+        gamestate.shotpool.acquire(gamestate, (center[0] + x, center[1] + y), v)
+
+def run(spec, warmup=WARMUP, mintime=2.0, minrounds=5):
+    """Run one scenario in this process, over and over from the start, for
+    at least mintime seconds and minrounds rounds. Returns the measurements
+    from the quickest round, and how many rounds there were.
+
+    The small scenarios only take a tenth of a second, and timed just once,
+    whatever else the machine was doing can make them look 30% slower. Other
+    things only ever slow a round down, so the quickest one is the fairest."""
+    best = None
+    rounds = elapsed = 0
+    while rounds < minrounds or elapsed < mintime:
+        result = run_once(spec, warmup)
+        rounds = rounds + 1
+        elapsed = elapsed + spec['ticks'] / result['ticks_per_sec']
+        if best is None or result['ticks_per_sec'] > best['ticks_per_sec']:
+            best = result
+    best['rounds'] = rounds
+    return best
+
+def run_once(spec, warmup=WARMUP):
+    """Run one scenario once, in this process. Returns its measurements."""
+    gamestate, keystate = build(spec)
+    bodies = len(gamestate.bodys)
+    for k in xrange(warmup):
+        gamestate.step(keystate)
+    profiler = gamestate.profiler = Profiler(window=spec['ticks'], keep=False)
+    gc.collect()
+    gc.disable()  # So the count of tracked objects only goes up and down with them
+    objects = gc.get_count()[0]
+    start = timeit.default_timer()
+    for k in xrange(spec['ticks']):
+        profiler.begin()
+        gamestate.step(keystate)
+        profiler.endframe()
+    elapsed = timeit.default_timer() - start
+    objects = gc.get_count()[0] - objects
+    gc.enable()
+    assert len(gamestate.bodys) >= 0.98 * bodies, '%s: only %d of the %d Bodys lasted the run' % (
+        spec['name'], len(gamestate.bodys), bodies)
+
+    phases = {}
+    for name in profiler.names:
+        if name not in profiler.counts:
+            phases[name] = 1000 * sum(profiler.recent[name]) / len(profiler.recent[name])
+    return {'ticks_per_sec': spec['ticks'] / elapsed,
+            'ms_per_tick': phases,
+            'bodies': sum(profiler.recent['bodies']) / float(spec['ticks']),
+            'objects_per_tick': objects / float(spec['ticks']),
+            'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0}
+
+def run_isolated(spec):
+    """Run one scenario in a fresh process, so its peak memory is its own."""
+    pool = multiprocessing.Pool(1)
+    try:
+        return pool.apply(run, (spec,))
+    finally:
+        pool.terminate()
+
+def bench_scenarios(specs=SCENARIOS):
+    """Run the scenarios, printing a table as it goes. Returns name -> results."""
+    phases = ('input', 'collide', 'gravity', 'update', 'move')
+    print '%-26s %9s %8s' % ('scenario', 'ticks/s', 'bodies') + ''.join('%9s' % p for p in phases) + '%9s %9s' % ('MB', 'objs/tick')
+    results = {}
+    for spec in specs:
+        result = results[spec['name']] = run_isolated(spec)
+        print '%-26s %9.1f %8.0f' % (spec['name'], result['ticks_per_sec'], result['bodies']) + \
+              ''.join('%9.3f' % result['ms_per_tick'].get(p, 0) for p in phases) + \
+              '%9.1f %9.2f' % (result['peak_rss_mb'], result['objects_per_tick'])
+    return results
+
+def regressions(results, baseline, tolerance=TOLERANCE):
+    """Return (name, now, before) for every scenario whose tick rate dropped by more than tolerance."""
+    slower = []
+    for name, before in sorted(baseline.items()):
+        if name in results:
+            now = results[name]['ticks_per_sec']
+            if now < (1 - tolerance) * before['ticks_per_sec']:
+                slower.append((name, now, before['ticks_per_sec']))
+    return slower
+
+def confirmed_regressions(results, baseline, tolerance=TOLERANCE, retries=2):
+    """regressions(), but every scenario that looks slower is run again (up
+    to retries more times, keeping its quickest results) before it counts.
+
+    Keeping the quickest round isn't enough by itself: on a busy machine
+    the whole couple of seconds can be slowed down, and here the same code
+    came out as much as 30% slower from one run of the suite to the next.
+    A real regression is slower every time. Even run three times, though,
+    unchanged scenarios still came out as much as 25% slower than their
+    best, which is why TOLERANCE is 0.3. results is updated."""
+    slower = regressions(results, baseline, tolerance)
+    for k in xrange(retries):
+        if not slower:
+            break
+        names = [name for name, now, before in slower]
+        print 'Running %s again...' % ', '.join(names)
+        for name, result in bench_scenarios([spec for spec in SCENARIOS if spec['name'] in names]).items():
+            if result['ticks_per_sec'] > results[name]['ticks_per_sec']:
+                results[name] = result
+        slower = regressions(results, baseline, tolerance)
+    return slower
+
+
+def crowd(n, seed=0, walls=WALLS):
+    """Return a GameState holding n shots (and a sun) strewn about at random."""
+    rand = random.Random(seed)
+    gamestate = GameState(Config(WALLS=walls))
+    shot, ball = pygame.Surface((5, 5)), pygame.Surface((40, 40))
+    Sun(gamestate, (ball, ball.get_rect()), (DISP_WIDTH / 2, DISP_HEIGHT / 2))
+    for k in xrange(n - 1):
+        Shot(gamestate, (shot, shot.get_rect()),
+             (rand.uniform(0, DISP_WIDTH), rand.uniform(0, DISP_HEIGHT)),
+             (rand.uniform(-SHOT_SPEED, SHOT_SPEED), rand.uniform(-SHOT_SPEED, SHOT_SPEED)))
+    return gamestate
+
+def nested_loop(gamestate, budget=1.0):
+    """The old all-pairs loop. Returns (seconds, hits, estimated?)."""
+    bodys = gamestate.bodys
+    n = len(bodys.sprites())
+    total = n * (n - 1) / 2
+    done = hits = 0
+    start = timeit.default_timer()
+    for i in xrange(len(bodys.sprites()) - 1):
+        for j in xrange(i + 1, len(bodys.sprites())):
+            if bodys.sprites()[i].intersects(bodys.sprites()[j]):
+                hits += 1
+        done += n - 1 - i
+        elapsed = timeit.default_timer() - start
+        if elapsed > budget and done < total:
+            return elapsed * total / done, hits, True
+    return timeit.default_timer() - start, hits, False
+
+def broadphase(gamestate, phase, walls=WALLS, repeat=3):
+    """Best-of-repeat time for a broad phase plus the narrow phase. Returns (seconds, candidates, hits)."""
+    world = gamestate.world
+    best = None
+    for k in xrange(repeat):
+        start = timeit.default_timer()
+        i, j = phase.pairs(world, walls)
+        hits = world.touching(i, j, walls).sum()
+        elapsed = timeit.default_timer() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(i), hits
+
+def bench_collisions(sizes=(10, 100, 1000, 10000), walls=WALLS):
+    print '%7s %12s %12s %12s %10s %8s' % ('bodies', 'nested loop', 'grid', 'sweep+prune', 'candidates', 'hits')
+    for n in sizes:
+        gamestate = crowd(n, walls=walls)
+        old, oldhits, estimated = nested_loop(gamestate)
+        grid, candidates, hits = broadphase(gamestate, GridBroadPhase(), walls)
+        sap = broadphase(gamestate, SweepAndPrune(), walls)[0]
+        print '%7d %11s%s %11.2fms %11.2fms %10d %8d' % (n, '%.2fms' % (1000 * old), '~' if estimated else ' ',
+                                                    1000 * grid, 1000 * sap, candidates, hits)
+        if not estimated and oldhits != hits:
+            print '  warning: nested loop found %d hits' % oldhits
+
+def bench_gravity(sizes=(10, 100, 300, 1000, 3000, 10000)):
+    """Time each gravity solver on crowds of each size, and say which of all pairs
+    and barnes-hut was quicker. (massive leaves the light Bodys' pulls out, so
+    it isn't in the running.)"""
+    solvers = [('all pairs', AllPairsGravity()), ('massive', MassiveGravity(GRAV_THRESHOLD)),
+               ('barnes-hut', BarnesHutGravity(0.5))]
+    print '%7s' % 'bodies' + ''.join('%12s %11s' % (name, 'pulls') for name, solver in solvers) + '  quickest'
+    for n in sizes:
+        world = crowd(n).world
+        line = '%7d' % n
+        times = {}
+        for name, solver in solvers:
+            start = timeit.default_timer()
+            solver.apply(world, GRAV_CONST)
+            times[name] = timeit.default_timer() - start
+            line += ' %9.2fms %11d' % (1000 * times[name], solver.evaluations)
+        print line + '  ' + min(('all pairs', 'barnes-hut'), key=times.get)
+
+
+def footprint(obj):
+    """Roughly how many bytes obj takes up by itself: the object, and any dicts and Rects
+    it holds (counting the dicts and Rects in those dicts too)."""
+    size = sys.getsizeof(obj)
+    for ref in gc.get_referents(obj):
+        if isinstance(ref, pygame.Rect):
+            size = size + sys.getsizeof(ref)
+        elif isinstance(ref, dict):
+            size = size + sys.getsizeof(ref) + sum(sys.getsizeof(value) for value in ref.values()
+                                                   if isinstance(value, (dict, pygame.Rect)))
+    return size
+
+def world_row(world):
+    """How many bytes one Body's row of the World takes up."""
+    return sum(arr.strides[0] for arr in (world.p, world.v, world.a, world.mass, world.radius, world.alive, world.kind)) + \
+           sys.getsizeof([None]) - sys.getsizeof([])  # Its entry in world.bodies
+
+def bench_memory(shots=10000):
+    gamestate = GameState(headless=True)
+    gamestate.load_sounds()
+    ship = gamestate.new_game()[0]
+    sun = [body for body in gamestate.world.bodies if isinstance(body, Sun)][0]
+    shot = gamestate.shotpool.acquire(gamestate, (100, 100))
+    explosion = Explosion.blank(gamestate)
+    row = world_row(gamestate.world)
+    print '%-10s %8s %8s %8s' % ('', 'object', 'world', 'total')
+    for name, obj, inworld in (('Ship', ship, True), ('Sun', sun, True), ('Shot', shot, True), ('Flame', ship.flame, False),
+                               ('Meter', ship.meter, False), ('Explosion', explosion, False)):
+        size = footprint(obj)
+        print '%-10s %8d %8s %8d' % (name, size, inworld and row or '', size + (inworld and row))
+    print '%d shots: %.1f MB' % (shots, shots * (footprint(shot) + row) / 1048576.0)
+
+
+def orbits(n=50, seed=0):
+    """A World with a sun in the middle and n Bodys going round it, in circles or ellipses."""
+    rand = random.Random(seed)
+    world = World(pygame.Rect(0, 0, 2000, 2000))  # Big enough that nothing goes near the edges
+    center = numpy.array((1000.0, 1000.0))
+    world.add(None, center, mass=SUN_MASS, radius=20)
+    for k in xrange(n):
+        d, angle = rand.uniform(60, 280), rand.uniform(0, 2 * math.pi)  # Nor into the sun
+        # A pull of G*M/d makes every circular orbit the same speed.
+        speed = math.sqrt(GRAV_CONST * SUN_MASS) * rand.choice((1, 1, 0.8, 1.2))
+        world.add(None, center + d * numpy.array((math.cos(angle), math.sin(angle))),
+                  speed * numpy.array((-math.sin(angle), math.cos(angle))), radius=2)
+    return world
+
+def bench_integrators(ticks=2000):
+    gravity = MassiveGravity(GRAV_THRESHOLD)
+    def gravitate():
+        gravity.apply(world, GRAV_CONST)
+    print '%-12s %9s %11s %11s %10s' % ('integrator', 'substeps', 'max drift', 'end drift', 'ms/tick')
+    for name, substeps, courant in (('euler', 1, None), ('symplectic', 1, None), ('leapfrog', 1, None),
+                                    ('euler', 8, None), ('symplectic', 8, None), ('leapfrog', 8, None),
+                                    ('symplectic', 1, 0.05), ('leapfrog', 1, 0.05)):
+        world = orbits()
+        integrator = INTEGRATORS[name](substeps, courant=courant, threshold=GRAV_THRESHOLD)
+        live = world.live()
+        kinetic = 0.5 * (world.mass[live] * (world.v[live] ** 2).sum(1)).sum()
+        start = energy(world, GRAV_CONST, GRAV_THRESHOLD)
+        drift = 0
+        used = 0
+        elapsed = 0
+        for k in xrange(ticks):
+            begin = timeit.default_timer()
+            integrator.advance(world, 0, 1000, gravitate)  # No walls, no speed limit
+            elapsed = elapsed + timeit.default_timer() - begin
+            used = used + integrator.used
+            drift = max(drift, abs(energy(world, GRAV_CONST, GRAV_THRESHOLD) - start) / kinetic)
+        end = abs(energy(world, GRAV_CONST, GRAV_THRESHOLD) - start) / kinetic
+        print '%-12s %9s %11.2e %11.2e %10.3f' % (name, courant and '~%.1f' % (used / float(ticks)) or substeps,
+                                                 drift, end, 1000 * elapsed / ticks)
+
+
+HEADLESS_STARTUP = '''
+import timeit
+start = timeit.default_timer()
+from spacewar_headless import KeyState, headless_gamestate
+imported = timeit.default_timer()
+gamestate = headless_gamestate()
+gamestate.new_game()
+gamestate.step(KeyState())
+print imported - start, timeit.default_timer() - start
+'''
+
+def bench_startup(runs=5):
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT='1')
+    times = []
+    for k in xrange(runs):
+        out = subprocess.check_output([sys.executable, '-c', HEADLESS_STARTUP], cwd=here, env=env)
+        times.append([float(t) for t in out.split()])
+    imported, ticked = [sorted(column)[len(column) // 2] for column in zip(*times)]
+    print 'headless: %.1fms importing, %.1fms to the first tick' % (1000 * imported, 1000 * ticked)
+    if 'DISPLAY' not in env:
+        env.setdefault('SDL_VIDEODRIVER', 'dummy')
+        env.setdefault('SDL_AUDIODRIVER', 'dummy')
+    print 'windowed:'
+    print subprocess.check_output([sys.executable, 'spacewar.py', '--startup'], cwd=here, env=env).rstrip()
+
+
+if __name__ == '__main__':
+    parser = optparse.OptionParser(usage='%prog [options] | %prog --compare [bodies ...] | %prog --memory | %prog --integrators [ticks] | %prog --startup [runs]')
+    parser.add_option('--out', help='save the results here')
+    parser.add_option('--baseline', help='compare the results with these')
+    parser.add_option('--tolerance', type='float', default=TOLERANCE, help='how much slower is a regression [%default]')
+    parser.add_option('--retries', type='int', default=2, help='how many more times to run a scenario that looks slower [%default]')
+    parser.add_option('--only', help='only scenarios with this in their name')
+    parser.add_option('--compare', action='store_true', help='compare broad phases and gravity solvers instead')
+    parser.add_option('--memory', action='store_true', help='show how many bytes each kind of sprite takes instead')
+    parser.add_option('--integrators', action='store_true', help='compare the integrators\' energy drift instead')
+    parser.add_option('--startup', action='store_true', help='time starting up instead')
+    options, args = parser.parse_args()
+
+    if options.memory:
+        bench_memory()
+        sys.exit()
+    if options.integrators:
+        bench_integrators(*[int(n) for n in args[:1]])
+        sys.exit()
+    if options.startup:
+        bench_startup(*[int(n) for n in args[:1]])
+        sys.exit()
+
+    if options.compare:
+        sizes = [int(n) for n in args] or (10, 100, 300, 1000, 3000, 10000)
+        bench_collisions(sizes)
+        print
+        bench_gravity(sizes)
+        sys.exit()
+
+    results = bench_scenarios([spec for spec in SCENARIOS if not options.only or options.only in spec['name']])
+    slower = []
+    if options.baseline:
+        slower = confirmed_regressions(results, json.load(open(options.baseline)), options.tolerance, options.retries)
+    if options.out:
+        with open(options.out, 'w') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+    for name, now, before in slower:
+        print 'REGRESSION: %s: %.1f ticks/s, down from %.1f' % (name, now, before)
+    if slower:
+        sys.exit(1)
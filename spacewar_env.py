@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+
+"""Spacewar as an environment to train agents in, gym-style.
+
+    python spacewar_env.py [worlds] [steps] [--workers N] [--opponent]
+
+A VectorEnv is N headless games played in lockstep. Each step, every game
+takes an action for each ship the agents fly (a row of four, like a
+Controller's decision: thrust, left, right, shoot) and plays one tick:
+
+    env = VectorEnv(64, opponent=HeuristicAI(), workers=4)
+    obs = env.reset()
+    while training:
+        obs, rewards, dones, info = env.step(policy(obs))
+    env.close()
+
+The observations, rewards and so on are arrays made once, when the
+VectorEnv is, and written over in place every step -- step() returns the
+same arrays every time, so copy them if you want to keep them. obs is a
+dict of:
+
+    ships   (N, 2, 7)         x, y, vx, vy, angle, energy, alive, for both ships
+    shots   (N, MAXSHOTS, 5)  x, y, vx, vy, ticks left, for the first nshots
+    nshots  (N,)              how many rows of shots are real
+
+rewards (N, ships flown) is the energy the enemy lost this tick less the
+energy you lost, as a fraction of START_ENERGY, plus 1 for winning (-1
+for losing). When a game ends, dones says so, info['winners'] says who
+won, and the game starts again straight away: the observation is the new
+game's.
+
+With workers, the games are shared out among that many processes, which
+step their games at the same time. Everything above lives in shared
+memory, so all that goes down the pipes is "step!" and "done"."""
+
+import multiprocessing, multiprocessing.sharedctypes, optparse, random, time
+
+import numpy
+
+from spacewar_func import *
+from spacewar_headless import KeyState, headless_gamestate, outcome
+from spacewar_ai import press
+
+MAXSHOTS = 64  # Shots past this many aren't observed
+SHIP_FIELDS = ('x', 'y', 'vx', 'vy', 'angle', 'energy', 'alive')
+SHOT_FIELDS = ('x', 'y', 'vx', 'vy', 'timeleft')
+
+
+class Shard:
+    """Some of a VectorEnv's games, played in this process.
+
+    arrays holds this shard's rows of the VectorEnv's arrays (views, so
+    writing to them writes to the VectorEnv's)."""
+
+    def __init__(self, first, count, arrays, config, opponent, players, seed, maxticks):
+        self.first = first
+        self.count = count
+        self.arrays = arrays
+        self.config = config
+        self.opponent = opponent
+        self.players = players
+        self.maxticks = maxticks
+        self.randoms = [random.Random(seed + first + k) for k in xrange(count)]
+        self.games = [None] * count  # (gamestate, ships, keystate) for each game
+        self.ticks = [0] * count
+
+    def reset(self):
+        for k in xrange(self.count):
+            self.new_game(k)
+            self.observe(k)
+        self.arrays['rewards'][:] = 0
+        self.arrays['dones'][:] = False
+
+    def new_game(self, k):
+        """Start game k again. Like spacewar_ai.duels(), the ships start off moving a little differently each time."""
+        gamestate = headless_gamestate(self.config)
+        ships = gamestate.new_game()
+        rand = self.randoms[k]
+        for ship in ships:
+            ship.v = ship.v + (rand.uniform(-1, 1), rand.uniform(-1, 1))
+        self.games[k] = (gamestate, ships, KeyState())
+        self.ticks[k] = 0
+
+    def step(self):
+        arrays = self.arrays
+        actions = arrays['actions'].tolist()
+        players = self.players
+        for (gamestate, ships, keystate), action in zip(self.games, actions):
+            for ship, decision in zip(ships[:players], action):
+                press(keystate, ship, decision)
+        if self.opponent:
+            # One batch for all of this shard's games, for each ship the agents don't fly
+            for n in xrange(players, 2):
+                fleet = [(gamestate, ships[n]) for gamestate, ships, keystate in self.games if ships[n].alive()]
+                keystates = [keystate for gamestate, ships, keystate in self.games if ships[n].alive()]
+                self.opponent.fly(fleet, keystates)
+
+        rewards, dones, winners = arrays['rewards'], arrays['dones'], arrays['winners']
+        for k, (gamestate, ships, keystate) in enumerate(self.games):
+            before = [ship.meter.value for ship in ships]
+            gamestate.step(keystate)
+            self.ticks[k] = self.ticks[k] + 1
+            lost = [b - ship.meter.value for b, ship in zip(before, ships)]
+            start = float(self.config.START_ENERGY)
+            for n in xrange(players):
+                rewards[k, n] = (lost[1 - n] - lost[n]) / start
+            dones[k] = len(gamestate.ships) < len(ships) or self.ticks[k] >= self.maxticks
+            if dones[k]:
+                winner = outcome(ships, self.ticks[k])['winner']
+                winners[k] = winner
+                for n in xrange(players):
+                    if winner:
+                        rewards[k, n] = rewards[k, n] + (winner == n + 1 and 1 or -1)
+                self.new_game(k)
+            self.observe(k)
+
+    def observe(self, k):
+        """Write game k's observation into the arrays."""
+        gamestate, ships, keystate = self.games[k]
+        world = gamestate.world
+        obs = self.arrays['ships'][k]
+        for n, ship in enumerate(ships):
+            row = obs[n]
+            if ship.alive():
+                slot = ship.slot
+                row[0:2] = world.p[slot]
+                row[2:4] = world.v[slot]
+                row[4] = ship.angle
+                row[5] = ship.meter.value
+                row[6] = 1
+            else:
+                row[5:7] = 0  # Where it died, with nothing left
+        shots = numpy.flatnonzero(world.alive & (world.kind == Shot.kind))[:MAXSHOTS]
+        m = len(shots)
+        obs = self.arrays['shots'][k]
+        obs[:m, 0:2] = world.p[shots]
+        obs[:m, 2:4] = world.v[shots]
+        bodies = world.bodies
+        obs[:m, 4] = [bodies[slot].timeleft for slot in shots.tolist()]
+        obs[m:] = 0
+        self.arrays['nshots'][k] = m
+
+### End class Shard
+
+
+def serve(conn, shard):
+    """A worker process's loop: do what the VectorEnv says to our Shard, until it says 'close'."""
+    while True:
+        command = conn.recv()
+        if command == 'close':
+            break
+        getattr(shard, command)()
+        conn.send(None)
+    conn.close()
+
+
+class VectorEnv:
+    """N games of Spacewar, stepped together. See the module docstring.
+
+    players is how many ships (1 or 2) the agents fly; opponent is a
+    Controller for the rest (HeuristicAI, say). workers is how many
+    processes to share the games out among (0: play them all in this one)."""
+
+    def __init__(self, n, config=None, opponent=None, players=None, seed=0, maxticks=10000, workers=0):
+        if players is None:
+            players = opponent and 1 or 2
+        self.n = n
+        self.config = config or Config()
+        self.players = players
+        self.shapes = {'actions': ((n, players, 4), numpy.int8),
+                       'ships':   ((n, 2, len(SHIP_FIELDS)), numpy.float32),
+                       'shots':   ((n, MAXSHOTS, len(SHOT_FIELDS)), numpy.float32),
+                       'nshots':  ((n,), numpy.int32),
+                       'rewards': ((n, players), numpy.float32),
+                       'dones':   ((n,), numpy.bool_),
+                       'winners': ((n,), numpy.int8)}
+        self.arrays = {}
+        for name, (shape, dtype) in self.shapes.items():
+            if workers:
+                # Made before the workers are forked, so they all see the same memory
+                size = int(numpy.prod(shape)) * numpy.dtype(dtype).itemsize
+                buf = multiprocessing.sharedctypes.RawArray('b', size)
+                self.arrays[name] = numpy.frombuffer(buf, dtype=dtype).reshape(shape)
+            else:
+                self.arrays[name] = numpy.zeros(shape, dtype=dtype)
+        for name in self.shapes:
+            setattr(self, name, self.arrays[name])
+        self.obs = {'ships': self.ships, 'shots': self.shots, 'nshots': self.nshots}
+        self.info = {'winners': self.winners}
+
+        self.shards, self.workers = [], []
+        bounds = [n * w // max(workers, 1) for w in xrange(max(workers, 1) + 1)]
+        for first, last in zip(bounds, bounds[1:]):
+            views = dict((name, array[first:last]) for name, array in self.arrays.items())
+            shard = Shard(first, last - first, views, self.config, opponent, players, seed, maxticks)
+            if workers:
+                conn, theirs = multiprocessing.Pipe()
+                process = multiprocessing.Process(target=serve, args=(theirs, shard))
+                process.daemon = True
+                process.start()
+                self.workers.append((process, conn))
+            else:
+                self.shards.append(shard)
+
+    def _all(self, command):
+        for process, conn in self.workers:
+            conn.send(command)
+        for shard in self.shards:
+            getattr(shard, command)()
+        for process, conn in self.workers:
+            conn.recv()
+
+    def reset(self):
+        """Start every game again. Returns the observations."""
+        self._all('reset')
+        return self.obs
+
+    def step(self, actions=None):
+        """Play a tick of every game. Returns (obs, rewards, dones, info).
+
+        actions is (N, players, 4) (anything that'll go into that shape),
+        or None if they've already been written into self.actions."""
+        if actions is not None and actions is not self.actions:
+            self.actions[...] = actions
+        self._all('step')
+        return self.obs, self.rewards, self.dones, self.info
+
+    def close(self):
+        for process, conn in self.workers:
+            conn.send('close')
+            process.join()
+        self.workers = []
+
+### End class VectorEnv
+
+
+if __name__ == '__main__':
+    parser = optparse.OptionParser(usage='%prog [worlds] [steps] [options]')
+    parser.add_option('--workers', type='int', default=0, help='processes to share the worlds among [%default]')
+    parser.add_option('--opponent', action='store_true', help='HeuristicAI flies ship 2')
+    options, args = parser.parse_args()
+    n = int(args[0]) if len(args) > 0 else 64
+    steps = int(args[1]) if len(args) > 1 else 500
+
+    opponent = None
+    if options.opponent:
+        from spacewar_ai import HeuristicAI
+        opponent = HeuristicAI()
+    env = VectorEnv(n, opponent=opponent, workers=options.workers)
+    env.reset()
+    rand = numpy.random.RandomState(0)
+    actions = rand.randint(0, 2, (steps,) + env.actions.shape).astype(numpy.int8)  # Made beforehand, so they aren't timed
+    episodes = 0
+    start = time.time()
+    for k in xrange(steps):
+        obs, rewards, dones, info = env.step(actions[k])
+        episodes = episodes + dones.sum()
+    elapsed = time.time() - start
+    env.close()
+    print '%d worlds x %d steps in %.2fs: %.0f env steps/s, %d games finished' % (n, steps, elapsed, n * steps / elapsed, episodes)
@@ -2,11 +2,17 @@
 
 """Handy functions and classes for my Spacewar program"""
 
-import math, os, sys, pygame
+import collections, csv, itertools, json, math, os, struct, sys, threading, timeit, pygame
 
 # Numeric arrays are elegant: 2*[2,4] == [4,8] rather than 2*[2,4] == [2,4,2,4]
 # I don't remember why I'm not just using plain arrays. Speed? Oh well.
 from numpy import array
+import numpy
+
+# Positions, velocities etc. of all Bodys live together in a World.
+from spacewar_physics import World, BruteForce, GridBroadPhase, SweepAndPrune
+from spacewar_physics import AllPairsGravity, MassiveGravity, BarnesHutGravity
+from spacewar_physics import INTEGRATORS, Euler, SemiImplicitEuler, Leapfrog
 
 # pygame constants, like "K_ESCAPE".
 import pygame.locals
@@ -14,11 +20,18 @@ import pygame.locals
 # Default initialization settings
 
 DISP_WIDTH, DISP_HEIGHT = (800, 600)
+WORLD_WIDTH, WORLD_HEIGHT = (0, 0)  # How big the universe is. 0 = the size of the display
 SOUND = 1
-FPS = 30  # frames per second
+FPS = 60  # frames per second (at most). The game goes at TICK_RATE whatever this is
+TICK_RATE = 30  # ticks of the game per second. Speeds etc. are all per tick, so this is how fast the game goes
+MAX_TICKS_PER_FRAME = 5  # If drawing falls further behind than this, the game slows down instead
 
 WALLS = 1           # Does the universe have bouncy walls? Or is it toroidal?
 GRAV_CONST = 0.01   # I like to make this very low, and the sun(s) massive.
+GRAV_THRESHOLD = 100  # Bodys lighter than this don't pull anything. 0 = everything pulls everything.
+SWEPT = 1  # Do Bodys collide if they touched between ticks? Otherwise fast shots can skip through things.
+INTEGRATOR = 'symplectic'  # How Bodys move: 'euler', 'symplectic' or 'leapfrog' (see spacewar_physics)
+SUBSTEPS = 1  # How many times a tick gravity is worked out. 0 = as many as needed near the sun(s)
 
 # Ships' keys for Thrust, Left, Right, Shoot
 SHIP1_KEYS = (pygame.locals.K_w, pygame.locals.K_a, pygame.locals.K_d, pygame.locals.K_q)
@@ -34,6 +47,8 @@ SHOT_SPEED = 6
 SHOT_LIFESPAN = 250
 SHOT_DELAY = 15
 SHOT_PAIN = 5
+POOL_SIZE = 100  # How many dead shots (and explosions) are kept around to be reused
+POOL_OVERFLOW = 'grow'  # When they're all in use: 'grow', 'drop' (no new shot) or 'recycle' (the oldest)
 
 # Functions
 
@@ -63,6 +78,16 @@ def load_image(name):
         raise SystemExit, message
     return image, image.get_rect()
 
+def image_size(fullname):
+    """Return the (width, height) of an image file. For PNGs, only the header is read."""
+    with open(fullname, 'rb') as f:
+        header = f.read(24)
+    if header[:8] == '\x89PNG\r\n\x1a\n' and header[12:16] == 'IHDR':
+        return struct.unpack('>II', header[16:24])
+    return pygame.image.load(fullname).get_size()
+
+SOUNDS = ("drip", "bam", "bonk", "doink")  # .wav files in the data directory
+
 def load_sound(name):
     """Load sound (wav) from data directory"""
 
@@ -80,31 +105,310 @@ def load_sound(name):
         raise SystemExit, message
     return soundplayer
 
+class Assets:
+    """Every image in the data directory, loaded (and converted) just once.
+
+    Everybody gets the same Surfaces, so don't draw on them. Rotated and
+    scaled versions are made once too, and kept: ships only ever turn in
+    SHIP_ROTATE steps, and an explosion only ever has the same 10 sizes.
+    hits and misses count how often something was (or wasn't) ready-made.
+
+    A headless Assets has no Surfaces at all, only their sizes (which, for
+    PNGs, don't even need the images decoding)."""
+
+    def __init__(self, headless=False, directory='data'):
+        self.headless = headless
+        self.directory = directory
+        self.surfaces = {}  # name -> Surface (or, headless, its size)
+        self.rotations = {}  # (Surface, angle) -> Surface
+        self.scalings = {}  # (Surface, size) -> Surface
+        self.hits = self.misses = 0
+
+    def preload(self, rotate_step=SHIP_ROTATE):
+        """Load every image, and make all the ship's rotations and explosion sizes."""
+        for name in sorted(os.listdir(self.directory)):
+            if os.path.splitext(name)[1].lower() in ('.png', '.jpg', '.bmp', '.gif'):
+                self.load(name)
+        if self.headless:
+            return
+        ship, flame = self.load("ship.png"), self.load("flame.png")
+        for angle in xrange(0, 360, rotate_step):
+            self.rotated(ship, float(angle))
+        for timeleft in xrange(1, 11):
+            self.scaled(flame, (3*timeleft, 3*timeleft))
+
+    def load(self, name):
+        if name in self.surfaces:
+            self.hits = self.hits + 1
+            return self.surfaces[name]
+        self.misses = self.misses + 1
+        fullname = os.path.join(self.directory, name)
+        try:
+            if self.headless:
+                surface = image_size(fullname)  # All we need to know for the radius
+            else:
+                surface = pygame.image.load(fullname).convert_alpha()
+        except (pygame.error, IOError), message:
+            print 'Cannot load image:', fullname
+            raise SystemExit, message
+        self.surfaces[name] = surface
+        return surface
+
+    def image(self, name):
+        """Like load_image(): return the image and a (new) bounding rectangle."""
+        surface = self.load(name)
+        if self.headless:
+            return None, pygame.Rect((0, 0), surface)
+        return surface, surface.get_rect()
+
+    def rotated(self, surface, angle):
+        """Return surface rotated by angle (in degrees)."""
+        key = (surface, angle)
+        if key in self.rotations:
+            self.hits = self.hits + 1
+        else:
+            self.misses = self.misses + 1
+            self.rotations[key] = pygame.transform.rotate(surface, angle)
+        return self.rotations[key]
+
+    def scaled(self, surface, size):
+        """Return surface scaled to size."""
+        key = (surface, size)
+        if key in self.scalings:
+            self.hits = self.hits + 1
+        else:
+            self.misses = self.misses + 1
+            self.scalings[key] = pygame.transform.scale(surface, size)
+        return self.scalings[key]
+
+### End class Assets
+
+_assets = {}
+
+def shared_assets(headless=False):
+    """The Assets every GameState uses, unless it's given its own."""
+    if headless not in _assets:
+        _assets[headless] = Assets(headless)
+    return _assets[headless]
+
+def silence():
+    """A sound that doesn't play"""
+    pass
+
 # Classes for our game objects
 
+class Config:
+    """The settings for one game.
+
+    Every setting starts out as the module constant of the same name (as it
+    is when the Config is made), and any of them can be changed by keyword:
+    Config(WALLS=0, SUN_MASS=5000)."""
+
+    NAMES = ('DISP_WIDTH', 'DISP_HEIGHT', 'SOUND', 'FPS', 'TICK_RATE', 'MAX_TICKS_PER_FRAME', 'WALLS', 'GRAV_CONST', 'GRAV_THRESHOLD', 'SWEPT',
+             'INTEGRATOR', 'SUBSTEPS', 'WORLD_WIDTH', 'WORLD_HEIGHT',
+             'SHIP1_KEYS', 'SHIP2_KEYS', 'SUN_MASS', 'MAXSPEED', 'SHIP_ROTATE', 'THRUST', 'START_ENERGY',
+             'CRASH_PAIN', 'SHOT_SPEED', 'SHOT_LIFESPAN', 'SHOT_DELAY', 'SHOT_PAIN', 'POOL_SIZE', 'POOL_OVERFLOW')
+
+    def __init__(self, **settings):
+        g = globals()
+        for name in self.NAMES:
+            setattr(self, name, g[name])
+        for name, value in settings.items():
+            if name not in self.NAMES:
+                raise TypeError('No such setting: %s' % name)
+            setattr(self, name, value)
+
+### End class Config
+
+
 class GameState():
-    flames     = pygame.sprite.RenderUpdates()
-    bodys      = pygame.sprite.RenderUpdates()
-    explosions = pygame.sprite.RenderUpdates()
-    ships      = pygame.sprite.Group()  # For keeping track of Ship.meters
-    soundplay = {}
+    """Everything in one game. Each GameState is a world of its own."""
+
+    def __init__(self, config=None, headless=False, assets=None):
+        self.config     = config or Config()
+        self.headless   = headless  # No screen or speakers: images are just rects, and nothing makes noise
+        self.assets     = assets or shared_assets(headless)
+        self.flames     = pygame.sprite.RenderUpdates()
+        self.bodys      = pygame.sprite.RenderUpdates()
+        self.explosions = pygame.sprite.RenderUpdates()
+        self.ships      = pygame.sprite.OrderedUpdates()  # For keeping track of Ship.meters (in order, so ship 1 always shoots first)
+        self.fleet      = []  # Every Ship, dead or alive, in the order they were made
+        self.soundplay  = {}
+        self.world      = World(pygame.Rect(0, 0, self.config.WORLD_WIDTH or self.config.DISP_WIDTH,
+                                                self.config.WORLD_HEIGHT or self.config.DISP_HEIGHT), swept=self.config.SWEPT)
+        self.broadphase = GridBroadPhase()  # Or SweepAndPrune(), or BruteForce()
+        self.gravity    = MassiveGravity(self.config.GRAV_THRESHOLD)  # Or AllPairsGravity(), or BarnesHutGravity(theta)
+        if self.config.SUBSTEPS:
+            self.integrator = INTEGRATORS[self.config.INTEGRATOR](self.config.SUBSTEPS)
+        else:
+            self.integrator = INTEGRATORS[self.config.INTEGRATOR](1, courant=0.05, threshold=self.config.GRAV_THRESHOLD)
+        self.pulls      = 0  # How many pulls were worked out last tick
+        self.shotpool      = Pool(Shot.blank, self.config.POOL_SIZE, self.config.POOL_OVERFLOW)
+        self.explosionpool = Pool(Explosion.blank, self.config.POOL_SIZE, self.config.POOL_OVERFLOW)
+        self.profiler   = None  # A Profiler, to time each part of a tick
+        self.collisions = 0  # How many pairs of Bodys collided last tick
+        self.responses  = RESPONSES  # What happens when they do (a CollisionTable)
+        self.hits       = {}  # (class name, class name) -> how many pairs of those collided last tick
+
+    def load_image(self, name):
+        return self.assets.image(name)
+
+    def load_sounds(self, background=False, done=None):
+        """Load the sounds (and start the mixer, if SOUND and nobody has yet).
+
+        With background, they're loaded by another thread, and each sound is
+        silent until it's ready; the thread is returned. done, if given, is
+        called when they're all loaded. Headless, they're all silent anyway."""
+        for name in SOUNDS:
+            self.soundplay[name] = silence
+        if self.headless:
+            return None
+        if not background:
+            self._load_sounds(done)
+            return None
+        thread = threading.Thread(target=self._load_sounds, args=(done,), name='sounds')
+        thread.daemon = True  # Don't hold up quitting
+        thread.start()
+        return thread
+
+    def _load_sounds(self, done):
+        if self.config.SOUND and pygame.mixer and not pygame.mixer.get_init():
+            try:
+                pygame.mixer.init()
+            except pygame.error:
+                pass  # No sound card: load_sound() makes them all silent
+        for name in SOUNDS:
+            self.soundplay[name] = load_sound(name + '.wav')
+        if done:
+            done()
+
+    def new_game(self):
+        """Put the ships and the sun in their starting places. Returns the two ships.
+
+        (For any other number of ships and suns, see spacewar_scenario.)"""
+        ship1 = Ship(self,self.load_image("ship.png"),(200,200),self.config.SHIP1_KEYS,(10,10),(-3,  3))
+        ship2 = Ship(self,self.load_image("ship.png"),(600,400),self.config.SHIP2_KEYS,(410,10),( 3, -3))
+        if self.config.SUN_MASS > 0:
+            Sun(self,self.load_image("ball.png"),self.world.area.center)
+        self.shotpool.fill(self)
+        if not self.headless:
+            self.explosionpool.fill(self)
+        return ship1, ship2
+
+    def step(self, keystate):
+        """Play one tick of the game, with the keys in keystate held down."""
+        profiler = self.profiler
+        for ship in self.ships.sprites(): # Dead ships don't take orders
+            ship.getinput(self, keystate)
+        if profiler: profiler.lap('input')
+
+        # Only pairs the broad phase says might be touching get compared.
+        self.collide()
+        if profiler: profiler.lap('collide')
+
+        # update: change velocities according to accelerations, postitions according to velocities, etc.
+        # (gravity gets worked out along the way).
+        # flames and meters don't need to be updated-- Ship.update() handles it when necessary.
+        self.pulls = 0
+        self.update()
+        if profiler:
+            profiler.count('bodies', len(self.bodys))
+            profiler.count('collisions', self.collisions)
+            profiler.count('pulls', self.pulls)
+
+    def collide(self):
+        """Find every pair of Bodys that are touching, and collide them."""
+        i, j = self.broadphase.pairs(self.world, self.config.WALLS)
+        hit = self.world.touching(i, j, self.config.WALLS)
+        self.collisions = hit.sum()
+        self.hits = self.responses.respond(self, i[hit], j[hit])
+        # Sprites should only be kill()ed in their updates-- if they're killed
+        # in here, we get a nasty error.
+
+    def gravitate(self):
+        """Add everybody's pull on everybody else to their accelerations."""
+        # The integrator calls this once or more a tick, in the middle of moving.
+        # Extremely close objects have no pull, which is also why nothing pulls itself.
+        profiler = self.profiler
+        if profiler: profiler.lap('move')
+        self.gravity.apply(self.world, self.config.GRAV_CONST)
+        self.pulls = self.pulls + self.gravity.evaluations
+        if profiler: profiler.lap('gravity')
+
+    def update(self):
+        """Move everything along by one tick."""
+        # Per-Body business first (thrust, timers, deaths), then the
+        # integrator moves every Body in the World at once (working out
+        # gravity as it goes), then the sprites catch up.
+        # The Bodys are updated in slot order rather than the group's, which
+        # depends on where they are in memory; otherwise shots would get
+        # different slots every time, and the same keys wouldn't always
+        # play out the same game.
+        profiler = self.profiler
+        bodies = self.world.bodies
+        for body in [bodies[slot] for slot in self.world.live().tolist()]:
+            body.update(self)
+        if profiler: profiler.lap('update')
+        self.integrator.advance(self.world, self.config.WALLS, self.config.MAXSPEED, self.gravitate)
+        self.interpolate(1.0)  # Every Body's place(), without getting each one's p out of the World one at a time
+        self.explosions.update(self)
+        if profiler: profiler.lap('move')
+
+    def interpolate(self, alpha):
+        """Put the sprites alpha of the way from where they were a tick ago to where they are.
+
+        For drawing in between ticks (when there are more frames than ticks)."""
+        world = self.world
+        live = world.live()
+        places = world.p[live]
+        if alpha < 1:
+            places = places - (1 - alpha) * world.moves(live, self.config.WALLS)
+        # One (x, y) at a time, rather than places.tolist(): thousands of
+        # little lists made all at once get the garbage collector going
+        # through every object there is, which takes longer than the tick.
+        bodies = world.bodies
+        xs, ys = places.T.tolist()
+        for slot, x, y in itertools.izip(live.tolist(), xs, ys):
+            bodies[slot].place((x, y))
+
+def _slot_property(name, doc):
+    """A Body attribute that actually lives in the Body's row of its World."""
+    def get(self):
+        return getattr(self.world, name)[self.slot]
+    def set(self, value):
+        getattr(self.world, name)[self.slot] = value
+    return property(get, set, doc=doc)
 
 class Body(pygame.sprite.Sprite):
     """Ships, shots, suns are all subclasses of this."""
 
+    # There can be tens of thousands of Bodys, so they keep their attributes
+    # in __slots__ rather than a dict each. Sprite has no __slots__ of its own,
+    # so the dict is still there if something needs it, but it's never made
+    # as long as every attribute (Sprite's own _Sprite__g too) has a slot.
+    # Each subclass lists the attributes it adds.
+    __slots__ = ('_Sprite__g', 'image', 'rect', 'config', 'world', 'slot', 'pool')
+
+    kind = 0  # Nothing happens when a plain Body collides. See CollisionTable
+
     def __init__(self, gamestate, img,p,v=(0,0)):
         pygame.sprite.Sprite.__init__(self)
         self.image, self.rect = img
-        self.area = pygame.Rect(0,0,DISP_WIDTH,DISP_HEIGHT)
+        self.config = gamestate.config
+        self.pool = None  # The Pool this came from, if any
         self.rect.center = p
-        self.p = array(self.rect.center) # position
-        self.v = array(v)                # velocity
-        # "a" = acceleration. Each tick it starts at 0,0 then gets changed by thrust & gravity, then gets added to "v"
-        self.a = array((0,0))
-        self.radius = self.rect.height/2
-        self.mass = 1.0
+        self.world = gamestate.world
+        self.slot = self.world.add(self, self.rect.center, v, 1.0, self.rect.height/2, self.kind)
         self.add(gamestate.bodys)
 
+    p      = _slot_property('p', "Position")
+    v      = _slot_property('v', "Velocity")
+    # "a" = acceleration. Each tick it starts at 0,0 then gets changed by thrust & gravity, then gets added to "v"
+    a      = _slot_property('a', "Acceleration")
+    mass   = _slot_property('mass', "Mass")
+    radius = _slot_property('radius', "Radius")
+    area   = property(lambda self: self.world.area, doc="The edges of the World, which every Body shares")
+
     def speed_sqrd(self):
         """Return the speed of the Body, squared."""
         return self.v[0]**2 + self.v[1]**2 # Why not return the speed? Because math.sqrt() is relatively expensive.
@@ -118,81 +422,33 @@ class Body(pygame.sprite.Sprite):
         """Alters this body's acceleration based on the distance and mass of body b. (I.e., gravity)"""
         if self.intersects(b): return # To keep Bodys from jamming against each other (I think). Also escapes when self=b
         r =  b.p - self.p
-        gravity = GRAV_CONST*b.mass/dist_sqrd((0,0),r)
+        gravity = self.config.GRAV_CONST*b.mass/dist_sqrd((0,0),r)
         self.a = self.a + gravity*r
 
     def update(self, gamestate):
-        self.v = self.v + self.a
-        self.p = self.p + self.v
-
-        if WALLS:
-            if self.p[0] - self.radius < self.area.left:
-                self.v[0] = -self.v[0]
-                self.p[0] = 2*self.radius-self.p[0]
-            elif self.p[0] + self.radius > self.area.right:
-                self.v[0] = -self.v[0]
-                self.p[0] = 2*self.area.right - 2*self.radius - self.p[0]
-            elif self.p[1] - self.radius < self.area.top:
-                self.v[1] = -self.v[1]
-                self.p[1] = 2*self.radius-self.p[1]
-            elif self.p[1] + self.radius > self.area.bottom:
-                self.v[1] = -self.v[1]
-                self.p[1] = 2*self.area.bottom - 2*self.radius - self.p[1]
-        else:   ### Toroidal universe (not very precise)
-            if   self.p[0] < self.area.left:
-                self.p[0] = self.area.right
-            elif self.p[0] > self.area.right:
-                self.p[0] = self.area.left
-            if   self.p[1] < self.area.top:
-                self.p[1] = self.area.bottom
-            elif self.p[1] > self.area.bottom:
-                self.p[1] = self.area.top
-
-        ### Speed limit
-        if self.speed_sqrd() > MAXSPEED**2:
-            self.v = normalize(self.v, MAXSPEED)
-
-        self.a = 0 * self.a  # Remove all acceleration, for this tick
-
-        self.rect.center = self.p # Update where the picture is blitted
+        """Per-Body business before the World moves everything. Plain Bodys have none."""
+        pass
+
+    def place(self, p):
+        """Draw the Body at p. (Usually where it is; see GameState.interpolate().)"""
+        self.rect.center = p # Update where the picture is blitted
+
+    def kill(self):
+        pygame.sprite.Sprite.kill(self)
+        if self.world.bodies[self.slot] is self:
+            self.world.remove(self.slot) # Give our row of the World to the next Body that's born
+        if self.pool:
+            self.pool.release(self)
+
+    def revive(self, gamestate, p, v=(0,0)):
+        """Bring a dead Body (from a Pool) back to life at p, moving at v."""
+        self.slot = self.world.add(self, p, v, 1.0, self.rect.height/2, self.kind)
+        self.rect.center = p
+        self.add(gamestate.bodys)
 
     def collide(self, gamestate, b):
-        """A collision between two Bodys, self and b."""
-        # This code is not in the class definitions of Ship, Sun, and Shot because
-        # A) I wanted to keep it in one place, and B) I didn't want to have to duplicate
-        # code: ship.collide(shot) should be the same as shot.collide(ship).
-
-        if isinstance(self,Sun):
-            if isinstance(b,Sun):
-                gamestate.soundplay["bonk"]()
-                self.bounce(b)
-            if isinstance(b,Ship):
-                gamestate.soundplay["bonk"]()
-                self.bounce(b)
-                b.meter.decrease(CRASH_PAIN)
-            if isinstance(b,Shot):
-                gamestate.soundplay["drip"]()
-                b.timeleft = 0
-        if isinstance(self,Ship):
-            if isinstance(b,Sun):
-                gamestate.soundplay["bonk"]()
-                self.bounce(b)
-                self.meter.decrease(CRASH_PAIN)
-            if isinstance(b,Ship):
-                gamestate.soundplay["bam"]()
-                self.bounce(b)
-            if isinstance(b,Shot):
-                gamestate.soundplay["doink"]()
-                b.timeleft = 0
-                self.meter.decrease(SHOT_PAIN)
-        if isinstance(self,Shot):
-            if isinstance(b,Sun):
-                gamestate.soundplay["drip"]()
-            if isinstance(b,Ship):
-                gamestate.soundplay["doink"]()
-                b.meter.decrease(SHOT_PAIN)
-            # if isinstance(b,Shot): tiny_boom.play()
-            self.timeleft = 0
+        """A collision between two Bodys, self and b. (What happens is up to gamestate.responses.)"""
+        gamestate.responses.respond(gamestate, numpy.array([self.slot]), numpy.array([b.slot]))
 
     def bounce(self,othr):
         """'Billiard-ball' collision"""
@@ -226,9 +482,11 @@ class Body(pygame.sprite.Sprite):
 class Sun(Body):
     """Sun object."""
 
+    __slots__ = ()
+
     def __init__(self, gamestate,img,p,v=(0,0)):
         Body.__init__(self, gamestate,img,p,v)
-        self.mass = SUN_MASS
+        self.mass = gamestate.config.SUN_MASS
 
 ### End class Sun
 
@@ -236,16 +494,22 @@ class Sun(Body):
 class Ship(Body):
     """Spaceship object."""
 
+    __slots__ = ('thrustkey', 'leftkey', 'rightkey', 'shootkey', 'angle', 'original', 'drawn_angle',
+                 'thrust', 'cantshoot', 'shotsfired', 'flame', 'meter')
+
     def __init__(self, gamestate, img, p, keys, meter_pos, v=(0,0)):
         Body.__init__(self, gamestate, img, p, v)
         (self.thrustkey, self.leftkey, self.rightkey, self.shootkey) = keys
         self.angle = 0.0
         self.original = self.image  # Useful for image rotations.
+        self.drawn_angle = self.angle  # The angle self.image is turned to
         self.thrust = 0
         self.cantshoot = 0  # this becomes nonzero for a short while after a shot is fired
-        self.flame = Flame()
-        self.meter = Meter(pygame.Rect(meter_pos[0], meter_pos[1], 300, 10),START_ENERGY)
+        self.shotsfired = 0
+        self.flame = Flame(gamestate.load_image("flame.png"))
+        self.meter = Meter(pygame.Rect(meter_pos[0], meter_pos[1], 300, 10),gamestate.config.START_ENERGY)
         self.add(gamestate.ships)
+        gamestate.fleet.append(self)
 
     def thrustvec(self):
         return (cos(self.angle), -sin(self.angle))
@@ -256,7 +520,7 @@ class Ship(Body):
         # If leftkey or rightkey is pressed, turn the ship.
         direction = keystate[self.leftkey] - keystate[self.rightkey]
         if direction:
-            self.rotate(SHIP_ROTATE * direction)
+            self.rotate(gamestate.config.SHIP_ROTATE * direction)
 
         # If thrustkey is pressed, thrust.
         if keystate[self.thrustkey]:
@@ -274,37 +538,41 @@ class Ship(Body):
         if self.cantshoot:
             self.cantshoot = self.cantshoot - 1
         if self.thrust:
-            tmp_thrustvec = self.thrustvec() # I use it twice, so I calculate it once
-            self.a = self.a + (THRUST * tmp_thrustvec[0], THRUST * tmp_thrustvec[1])
-            Body.update(self, gamestate)
-            self.flame.rect.center = self.p - (self.radius * tmp_thrustvec[0],self.radius * tmp_thrustvec[1])
-        else:
-            Body.update(self, gamestate) # I know, having this under the "if" AND the "else" seems silly. Trust me. it's good.
-
-        # update image-- theoretically only necessary if angle has changed but I do it every frame.
-        center = self.rect.center
-        self.image = pygame.transform.rotate(self.original, self.angle)
-        self.rect = self.image.get_rect() # The new image is a different size, so the center will move
-        self.rect.center = center # That's better
+            tmp_thrustvec = self.thrustvec()
+            thrust = gamestate.config.THRUST
+            self.a = self.a + (thrust * tmp_thrustvec[0], thrust * tmp_thrustvec[1])
+
+        # update image, if the angle has changed. The rotations are all made in advance.
+        if self.angle != self.drawn_angle and not gamestate.headless:
+            self.image = gamestate.assets.rotated(self.original, self.angle)
+            self.rect = self.image.get_rect() # The new image is a different size; place() puts the center back
+            self.drawn_angle = self.angle
         if self.meter <= 0:
-            self.kill()
             self.meter.value = 0
-            Shot(gamestate,
-                 load_image("shot.png"),
+            shot_speed = gamestate.config.SHOT_SPEED
+            gamestate.shotpool.acquire(gamestate,
                 (self.p[0] + 1.5*self.radius ,self.p[1] + 1.5*self.radius),
-                (self.v[0] + SHOT_SPEED,self.v[1] + 3))
-            Shot(gamestate,
-                 load_image("shot.png"),
+                (self.v[0] + shot_speed,self.v[1] + 3))
+            gamestate.shotpool.acquire(gamestate,
                 (self.p[0] + 1.5*self.radius ,self.p[1] - 1.5*self.radius),
-                (self.v[0] + SHOT_SPEED,self.v[1] - 3))
-            Shot(gamestate,
-                 load_image("shot.png"),
+                (self.v[0] + shot_speed,self.v[1] - 3))
+            gamestate.shotpool.acquire(gamestate,
                 (self.p[0] - 1.5*self.radius ,self.p[1] + 1.5*self.radius),
-                (self.v[0] - SHOT_SPEED,self.v[1] + 3))
-            Shot(gamestate,
-                 load_image("shot.png"),
+                (self.v[0] - shot_speed,self.v[1] + 3))
+            gamestate.shotpool.acquire(gamestate,
                 (self.p[0] - 1.5*self.radius ,self.p[1] - 1.5*self.radius),
-                (self.v[0] - SHOT_SPEED,self.v[1] - 3))
+                (self.v[0] - shot_speed,self.v[1] - 3))
+            self.kill() # Only after the shots are made: our row of the World gets reused.
+
+    def place(self, p):
+        Body.place(self, p)
+        if self.thrust:
+            tmp_thrustvec = self.thrustvec()
+            self.flame.rect.center = (p[0] - self.radius * tmp_thrustvec[0], p[1] - self.radius * tmp_thrustvec[1])
+
+    def kill(self):
+        self.flame.kill()  # Dead ships don't take input, so nothing else would put it out
+        Body.kill(self)
 
     def rotate(self,deg):
         """Rotate the ship image"""
@@ -313,67 +581,290 @@ class Ship(Body):
     def shoot(self,gamestate):
         """Shoot a missile"""
         tmp_thrustvec = self.thrustvec() # I use it twice, so I calculate it once
-        self.cantshoot = SHOT_DELAY
-        Shot(gamestate,
-             load_image("shot.png"),
+        shot_speed = gamestate.config.SHOT_SPEED
+        self.cantshoot = gamestate.config.SHOT_DELAY
+        self.shotsfired = self.shotsfired + 1
+        gamestate.shotpool.acquire(gamestate,
             (self.p[0] + 1.5*self.radius * tmp_thrustvec[0],self.p[1] + 1.5*self.radius * tmp_thrustvec[1]),
-            (self.v[0] + SHOT_SPEED      * tmp_thrustvec[0],self.v[1] + SHOT_SPEED      * tmp_thrustvec[1]))
+            (self.v[0] + shot_speed      * tmp_thrustvec[0],self.v[1] + shot_speed      * tmp_thrustvec[1]))
 
 ### End class Ship
 
 
 class Shot(Body):
     """Shot object"""
+
+    __slots__ = ('timeleft',)
+
     def __init__(self, gamestate,img,p,v=(0,0)):
         Body.__init__(self, gamestate,img,p,v)
-        self.timeleft = SHOT_LIFESPAN
+        self.timeleft = gamestate.config.SHOT_LIFESPAN
+
+    # Dead shots go back to gamestate.shotpool, and get born again from there.
+
+    def blank(gamestate):
+        """A dead Shot, for a Pool"""
+        shot = Shot(gamestate, gamestate.load_image("shot.png"), (0,0))
+        shot.kill()
+        return shot
+    blank = staticmethod(blank)
 
-    # Should I really be killing shots, or just putting them out of the way until one needs to be born?
+    def revive(self, gamestate, p, v=(0,0)):
+        Body.revive(self, gamestate, p, v)
+        self.timeleft = gamestate.config.SHOT_LIFESPAN
 
     def update(self, gamestate):
         # Shots live for a limited time, so update decrements their mortal coil.
         self.timeleft = self.timeleft - 1
-        if self.timeleft > 0: Body.update(self,gamestate)
-        else:
-            gamestate.explosions.add(Explosion(self.p))
+        if self.timeleft <= 0:
+            if not gamestate.headless:
+                gamestate.explosionpool.acquire(gamestate, self.p)
             self.kill()
 
 ### End class Shot
 
+
+class CollisionTable:
+    """What happens when two kinds of Body touch.
+
+    Every Body class has a kind, a small number, and the World keeps each
+    Body's kind in an array, so a tick's collisions can be sorted out by
+    pairs of kinds all at once rather than asking every pair what it is.
+    register(A, B, handler) says what happens when an A and a B touch. The
+    handler always gets the A first, whichever way round the pair was found,
+    so (B, A) doesn't need registering too. A new kind of Body just
+    registers its own collisions; nothing else has to change. (A subclass
+    nobody registers collides like its parent.)
+
+    A handler is called as handler(gamestate, a, b) for each pair. A batch
+    handler is called once a tick as handler(gamestate, world, i, j), with
+    arrays of the slots of every A (i) and B (j) that collided, which is
+    much quicker for things that collide by the hundred, like shots. Batches
+    go first; the rest are handled in the order the pairs were found."""
+
+    classes = [Body]  # kind -> class. Kinds belong to the classes, so every table shares them
+
+    def __init__(self):
+        self.handlers = {}  # (kind of A, kind of B) -> (handler, batch?)
+
+    def kind(self, cls):
+        """Return cls's kind, giving it one of its own if it hasn't got one yet."""
+        if 'kind' not in cls.__dict__:
+            cls.kind = len(CollisionTable.classes)
+            CollisionTable.classes.append(cls)
+        return cls.kind
+
+    def register(self, acls, bcls, handler, batch=False):
+        self.handlers[self.kind(acls), self.kind(bcls)] = (handler, batch)
+
+    def respond(self, gamestate, i, j):
+        """Collide the Bodys in slots i[n] and j[n], for every n.
+
+        Returns how many pairs of each kind collided, as a dict of
+        (class name, class name) -> count."""
+        world = gamestate.world
+        counts = {}
+        if not len(i):
+            return counts
+        n = len(self.classes)
+        pairs = world.kind[i].astype(int) * n + world.kind[j]
+        single = numpy.zeros(len(i), dtype=bool)
+        handlers = {}  # code -> (handler, the other way round?), for the one-pair-at-a-time handlers
+        for code in numpy.unique(pairs).tolist():
+            a, b = divmod(code, n)
+            swap = (a, b) not in self.handlers
+            if swap:
+                a, b = b, a
+            if (a, b) not in self.handlers:
+                continue
+            same = pairs == code
+            counts[self.classes[a].__name__, self.classes[b].__name__] = int(same.sum())
+            handler, batch = self.handlers[a, b]
+            if batch:
+                if swap: handler(gamestate, world, j[same], i[same])
+                else:    handler(gamestate, world, i[same], j[same])
+            else:
+                single = single | same
+                handlers[code] = handler, swap
+
+        # The rest go one at a time, in the order they were found: bounces
+        # off two things in one tick come out differently the other way round.
+        bodies = world.bodies
+        for x, y, code in zip(i[single].tolist(), j[single].tolist(), pairs[single].tolist()):
+            handler, swap = handlers[code]
+            if swap:
+                handler(gamestate, bodies[y], bodies[x])
+            else:
+                handler(gamestate, bodies[x], bodies[y])
+        return counts
+
+### End class CollisionTable
+
+
+# What happens when Bodys collide. Each pair of kinds is only written down
+# once: a ship hitting a shot is the same as a shot hitting a ship.
+
+def sun_hits_sun(gamestate, a, b):
+    gamestate.soundplay["bonk"]()
+    a.bounce(b)
+
+def ship_hits_sun(gamestate, ship, sun):
+    gamestate.soundplay["bonk"]()
+    ship.bounce(sun) # Not sun.bounce(ship): the sun hardly moves, so its velocity makes for a poor angle
+    ship.meter.decrease(gamestate.config.CRASH_PAIN)
+
+def ship_hits_ship(gamestate, a, b):
+    gamestate.soundplay["bam"]()
+    a.bounce(b)
+
+def ship_hits_shot(gamestate, ship, shot):
+    gamestate.soundplay["doink"]()
+    shot.timeleft = 0
+    ship.meter.decrease(gamestate.config.SHOT_PAIN)
+
+def shots_hit_suns(gamestate, world, shots, suns):
+    """Every shot that touched a sun fizzles out. (One drip does for the lot.)"""
+    gamestate.soundplay["drip"]()
+    bodies = world.bodies
+    for slot in numpy.unique(shots).tolist():
+        bodies[slot].timeleft = 0
+
+def shots_hit_shots(gamestate, world, i, j):
+    """Only the first shot of each pair dies; the other flies on."""
+    # if isinstance(b,Shot): tiny_boom.play()
+    bodies = world.bodies
+    for slot in numpy.unique(i).tolist():
+        bodies[slot].timeleft = 0
+
+RESPONSES = CollisionTable()
+RESPONSES.register(Sun,  Sun,  sun_hits_sun)
+RESPONSES.register(Ship, Sun,  ship_hits_sun)
+RESPONSES.register(Ship, Ship, ship_hits_ship)
+RESPONSES.register(Ship, Shot, ship_hits_shot)
+RESPONSES.register(Shot, Sun,  shots_hit_suns, batch=True)
+RESPONSES.register(Shot, Shot, shots_hit_shots, batch=True)
+
 class Flame(pygame.sprite.Sprite):
     """What comes out of the rockets"""
 
-    def __init__(self):
+    __slots__ = ('_Sprite__g', 'image', 'rect')  # See Body
+
+    def __init__(self, img):
         pygame.sprite.Sprite.__init__(self)
-        self.image, self.rect = load_image("flame.png")
+        self.image, self.rect = img
 
 ### End class Flame
 
 
 class Explosion(pygame.sprite.Sprite):
 
-    def __init__(self,p):
+    __slots__ = ('_Sprite__g', 'image', 'rect', 'original', 'timeleft', 'pool')  # See Body
+
+    def __init__(self, img, p):
         pygame.sprite.Sprite.__init__(self)
-        self.image, self.rect = load_image("flame.png")
+        self.image, self.rect = img
+        self.pool = None  # The Pool this came from, if any
+        self.original = self.image
         self.timeleft = 10
         self.rect.center = p
 
     def update(self, gamestate):
         if self.timeleft:
             center = self.rect.center
-            self.image = pygame.transform.scale(self.image,(3*self.timeleft,3*self.timeleft))
+            self.image = gamestate.assets.scaled(self.original,(3*self.timeleft,3*self.timeleft))
             self.rect = self.image.get_rect() # The new image is a different size, so the center will move
             self.rect.center = center # That's better
             self.timeleft = self.timeleft - 1
         else:
             self.kill()
 
+    def kill(self):
+        pygame.sprite.Sprite.kill(self)
+        if self.pool:
+            self.pool.release(self)
+
+    def blank(gamestate):
+        """A dead Explosion, for a Pool"""
+        return Explosion(gamestate.load_image("flame.png"), (0,0))
+    blank = staticmethod(blank)
+
+    def revive(self, gamestate, p):
+        self.image = self.original
+        self.rect = self.image.get_rect()
+        self.rect.center = p
+        self.timeleft = 10
+        self.add(gamestate.explosions)
+
 ### End class Explosion
 
 
-class Meter:
+class Pool:
+    """A bounded stock of dead sprites to bring back to life, rather than making new ones.
+
+    make(gamestate) makes a new dead sprite. acquire() gets one, calls its
+    revive() with the rest of the arguments, and returns it; when it's
+    killed, it comes back here. The pool keeps at most capacity sprites.
+    When they're all in use, overflow says what acquire() does:
+
+        'grow'    -- make a new one anyway. It's thrown away when it dies.
+        'drop'    -- return None.
+        'recycle' -- kill the oldest one in use, and use that.
+
+    hits counts sprites reused, allocations new ones made, drops refusals."""
+
+    def __init__(self, make, capacity=POOL_SIZE, overflow=POOL_OVERFLOW):
+        if overflow not in ('grow', 'drop', 'recycle'):
+            raise ValueError('No such overflow policy: %s' % overflow)
+        self.make = make
+        self.capacity = capacity
+        self.overflow = overflow
+        self.free = []
+        self.inuse = collections.OrderedDict()  # Oldest first
+        self.hits = self.allocations = self.drops = 0
+
+    def __len__(self):
+        return len(self.free) + len(self.inuse)
+
+    def new(self, gamestate):
+        self.allocations = self.allocations + 1
+        sprite = self.make(gamestate)
+        sprite.pool = self
+        return sprite
+
+    def fill(self, gamestate):
+        """Make sprites up to capacity in advance."""
+        while len(self) < self.capacity:
+            self.free.append(self.new(gamestate))
+
+    def acquire(self, gamestate, *args):
+        if not self.free and len(self) >= self.capacity:
+            if self.overflow == 'drop':
+                self.drops = self.drops + 1
+                return None
+            if self.overflow == 'recycle' and self.inuse:  # (With capacity 0, there's nothing to recycle: make one)
+                iter(self.inuse).next().kill()  # Which puts it in self.free
+        if self.free:
+            self.hits = self.hits + 1
+            sprite = self.free.pop()
+        else:
+            sprite = self.new(gamestate)
+        self.inuse[sprite] = True
+        sprite.revive(gamestate, *args)
+        return sprite
+
+    def release(self, sprite):
+        """Take back a dead sprite (Body.kill() and Explosion.kill() do this)."""
+        if self.inuse.pop(sprite, None) and len(self) < self.capacity:
+            self.free.append(sprite)
+
+### End class Pool
+
+
+class Meter(object):
     """Displays level of Energy, Shield, etc. for each ship"""
 
+    __slots__ = ('original_r', 'r', 'maximum', 'value')  # (__slots__ only work in new-style classes)
+
     def __init__(self,rectangle,maximum,value=None):
         self.original_r = rectangle
         self.r = rectangle.move(0,0) # This is the easiest way I could think of to copy a rectangle.
@@ -381,7 +872,7 @@ class Meter:
         if value: self.value = value
         else: self.value = maximum
 
-    def __cmp__(self,x): return self.value.__cmp__(x)
+    def __cmp__(self,x): return cmp(self.value, x)  # (floats have no __cmp__, and pains can be floats)
 
     def decrease(self,x):
         self.value = self.value - x
@@ -395,3 +886,396 @@ class Meter:
         pygame.draw.rect(screen,(255,255,255),self.r,1)
 
 ### End class Meter
+
+
+class FixedTimestep:
+    """Works out how many ticks to play each frame, so the game goes at rate
+    ticks a second however quickly (or slowly) frames get drawn.
+
+    Time left over that doesn't make a whole tick is carried on to the next
+    frame, and alpha is how far into the next tick that is, for drawing in
+    between (see GameState.interpolate()). When drawing is slow, a frame
+    plays several ticks (skipping the frames in between), but at most
+    maxticks; any more are dropped, and the game slows down rather than
+    falling further and further behind. dropped counts them."""
+
+    def __init__(self, rate, maxticks=MAX_TICKS_PER_FRAME, timer=timeit.default_timer):
+        self.tick = 1.0 / rate
+        self.maxticks = maxticks
+        self.timer = timer
+        self.last = None
+        self.accumulator = 0.0  # Time not yet played
+        self.alpha = 1.0
+        self.dropped = 0
+
+    def ticks(self):
+        """Return how many ticks to play this frame."""
+        now = self.timer()
+        if self.last is not None:
+            self.accumulator = self.accumulator + now - self.last
+        self.last = now
+        n = int(self.accumulator / self.tick)
+        self.accumulator = self.accumulator - n * self.tick
+        if n > self.maxticks:
+            self.dropped = self.dropped + n - self.maxticks
+            n = self.maxticks
+        self.alpha = self.accumulator / self.tick
+        return n
+
+### End class FixedTimestep
+
+
+class Renderer:
+    """Draws a GameState on the screen, only touching the parts that changed.
+
+    Each frame, the sprites are erased from where they were (by pasting the
+    background back), drawn where they are now, and only those rectangles
+    are sent to the display. Meters are only redrawn when they change or
+    something has been erased over them. If the changed rectangles add up
+    to more than threshold of the screen, the whole screen is flipped
+    instead, which is quicker than lots of little updates.
+
+    dirtyarea is how many pixels were updated last frame (overlaps counted
+    twice); frames, flips and totalarea add up as it goes."""
+
+    def __init__(self, screen, background, threshold=0.5):
+        self.screen = screen
+        self.background = background
+        self.threshold = threshold
+        self.lastrects = []  # What was updated last frame
+        self.meters = {}  # id(meter) -> (meter, value when last drawn)
+        self.overlay = None  # Something else to draw on top, like a Profiler
+        self.overlayrect = None
+        self.frames = self.flips = 0
+        self.dirtyarea = self.totalarea = 0
+
+    def start(self):
+        """Put up the whole background."""
+        self.screen.blit(self.background, (0, 0))
+        pygame.display.flip()
+        self.lastrects = []
+        self.meters = {}
+
+    def draw(self, gamestate, alpha=1.0):
+        """Draw a frame. alpha < 1 draws the Bodys that far between the last tick and this one."""
+        screen, background = self.screen, self.background
+        groups = (gamestate.flames, gamestate.bodys, gamestate.explosions)
+        if alpha < 1:
+            gamestate.interpolate(alpha)
+
+        # Erase the sprites, and the overlay
+        for group in groups:
+            group.clear(screen, background)
+        dirty = []
+        if self.overlayrect:
+            screen.blit(background, self.overlayrect, self.overlayrect)
+            dirty.append(self.overlayrect)
+            self.overlayrect = None
+
+        # Redraw meters that need it, and get rid of dead ships' meters
+        meters = {}
+        for ship in gamestate.ships.sprites():
+            meter = ship.meter
+            meters[id(meter)] = (meter, meter.value)
+            drawn = self.meters.get(id(meter), (None, None))[1]
+            if drawn != meter.value or meter.original_r.collidelist(self.lastrects) != -1:
+                meter.clear(screen, background)
+                meter.draw(screen)
+                dirty.append(meter.original_r)
+        for key, (meter, value) in self.meters.items():
+            if key not in meters:
+                meter.clear(screen, background)
+                dirty.append(meter.original_r)
+        self.meters = meters
+
+        # Draw the sprites. RenderUpdates.draw() gives back where they
+        # are now, along with where they were (which we just erased).
+        for group in groups:
+            dirty.extend(group.draw(screen))
+        if self.overlay:
+            self.overlayrect = self.overlay.draw(screen)
+            dirty.append(self.overlayrect)
+        if gamestate.profiler: gamestate.profiler.lap('draw')
+
+        area = sum([r.width * r.height for r in dirty])
+        if area > self.threshold * screen.get_width() * screen.get_height():
+            pygame.display.flip()
+            self.flips = self.flips + 1
+        elif dirty:
+            pygame.display.update(dirty)
+        if gamestate.profiler: gamestate.profiler.lap('display')
+        self.lastrects = dirty
+        self.frames = self.frames + 1
+        self.dirtyarea = area
+        self.totalarea = self.totalarea + area
+
+### End class Renderer
+
+
+class Camera:
+    """Which part of the World is on the screen, and how big it's drawn.
+
+    center is the point of the World in the middle of the screen, and scale
+    how many pixels across one unit of the World is. The scale only goes up
+    and down in steps of ZOOM (from 1), so there are only ever a few sizes
+    of each image to make (see Assets.scaled()). The camera stops at the
+    edges of the World, even a toroidal one."""
+
+    ZOOM = math.sqrt(2)
+    CLOSEST = 2  # How many steps in from 1 the camera can zoom
+
+    def __init__(self, size, area):
+        self.size = size  # Of the screen
+        self.area = area
+        self.level = 0  # scale = ZOOM ** level
+        self.center = area.center
+
+    scale = property(lambda self: self.ZOOM ** self.level)
+
+    def furthest(self):
+        """The level the whole World fits on the screen at."""
+        fits = min(self.size[0] / float(self.area.width), self.size[1] / float(self.area.height))
+        return min(int(math.floor(math.log(fits, self.ZOOM) + 1e-9)), 0)
+
+    def fit(self):
+        """Show the whole World."""
+        self.level = self.furthest()
+        self.center = self.area.center
+
+    def zoom(self, steps):
+        """Zoom in steps steps (out, if it's negative), as far as it'll go."""
+        self.level = min(max(self.level + steps, self.furthest()), self.CLOSEST)
+        self.pan(0, 0)
+
+    def pan(self, dx, dy):
+        """Move the view dx, dy pixels (on the screen)."""
+        x = min(max(self.center[0] + dx / self.scale, self.area.left), self.area.right)
+        y = min(max(self.center[1] + dy / self.scale, self.area.top), self.area.bottom)
+        self.center = (x, y)
+
+    def to_screen(self, p):
+        """Where points in the World (an (n, 2) array) are on the screen."""
+        return (p - self.center) * self.scale + (self.size[0] / 2.0, self.size[1] / 2.0)
+
+### End class Camera
+
+
+class CameraRenderer:
+    """Draws a GameState through a Camera, for Worlds bigger than the screen.
+
+    When the camera moves, everything does, so each frame is drawn from
+    scratch and flipped. Where the Bodys are on the screen is worked out
+    for all of them at once from the World (interpolated like
+    GameState.interpolate(), but without moving any sprites), and the ones
+    that aren't on it are left out before a single sprite is looked at:
+    with thousands of Bodys in the World, most of them usually aren't.
+
+    Only the meters of the ships in huds (the players') are drawn. drawn is
+    how many sprites were drawn last frame."""
+
+    def __init__(self, screen, background, camera, huds=()):
+        self.screen = screen
+        self.background = background
+        self.camera = camera
+        self.huds = huds
+        self.overlay = None  # Something else to draw on top, like a Profiler
+        self.frames = self.drawn = 0
+
+    def start(self):
+        self.screen.blit(self.background, (0, 0))
+        pygame.display.flip()
+
+    def draw(self, gamestate, alpha=1.0):
+        """Draw a frame. alpha < 1 draws the Bodys that far between the last tick and this one."""
+        screen, camera, world, assets = self.screen, self.camera, gamestate.world, gamestate.assets
+        width, height = screen.get_size()
+        scale = camera.scale
+        sized = {}  # image -> (image at this scale, half its width, half its height)
+        def size(image):
+            if image not in sized:
+                scaled = image
+                if scale != 1:
+                    w, h = image.get_size()
+                    # Not so small you can't see it
+                    scaled = assets.scaled(image, (max(int(w * scale), min(w, 2)), max(int(h * scale), min(h, 2))))
+                sized[image] = (scaled, scaled.get_width() // 2, scaled.get_height() // 2)
+            return sized[image]
+
+        live = world.live()
+        places = world.p[live]
+        if alpha < 1:
+            places = places - (1 - alpha) * world.moves(live, gamestate.config.WALLS)
+        centers = camera.to_screen(places)
+        reach = world.radius[live] * scale + 2
+        on = ((centers[:, 0] + reach >= 0) & (centers[:, 0] - reach < width) &
+              (centers[:, 1] + reach >= 0) & (centers[:, 1] - reach < height))
+        screen.blit(self.background, (0, 0))
+
+        # Flames first (they're behind their ships), then the Bodys, then explosions
+        blits = []
+        for ship in gamestate.ships.sprites():
+            if ship.thrust:
+                n = live.searchsorted(ship.slot)
+                if on[n]:
+                    image, w, h = size(ship.flame.image)
+                    thrust = ship.thrustvec()
+                    x = centers[n, 0] - ship.radius * scale * thrust[0]
+                    y = centers[n, 1] - ship.radius * scale * thrust[1]
+                    blits.append((image, (int(x) - w, int(y) - h)))
+        bodies = world.bodies
+        xs, ys = centers[on].astype(int).T.tolist()  # Not .tolist(): see GameState.interpolate()
+        for slot, x, y in itertools.izip(live[on].tolist(), xs, ys):
+            image, w, h = size(bodies[slot].image)
+            blits.append((image, (x - w, y - h)))
+        (cx, cy), (hx, hy) = camera.center, (width / 2.0, height / 2.0)
+        for explosion in gamestate.explosions.sprites():
+            x, y = explosion.rect.center
+            x, y = int((x - cx) * scale + hx), int((y - cy) * scale + hy)
+            image, w, h = size(explosion.image)
+            if -w <= x < width + w and -h <= y < height + h:
+                blits.append((image, (x - w, y - h)))
+        screen.blits(blits, False)
+
+        for ship in self.huds:
+            if ship and ship.alive():
+                ship.meter.draw(screen)
+        if self.overlay:
+            self.overlay.draw(screen)
+        if gamestate.profiler: gamestate.profiler.lap('draw')
+        pygame.display.flip()
+        if gamestate.profiler: gamestate.profiler.lap('display')
+        self.frames = self.frames + 1
+        self.drawn = len(blits)
+
+### End class CameraRenderer
+
+
+class Profiler:
+    """Times each part ("phase") of every frame, and keeps counts of things.
+
+    Call lap(phase) at the end of each phase: the time since the last lap
+    (or begin()) is charged to it. count() records a number for this frame,
+    like how many Bodys there are. endframe() files the frame away.
+
+    The last window frames are kept for percentiles (p50, p95, p99), which
+    draw() shows on the screen. Unless keep is false, every frame is kept
+    for dump()."""
+
+    def __init__(self, window=300, timer=timeit.default_timer, keep=True):
+        self.window = window
+        self.keep = keep
+        self.timer = timer
+        self.names = []  # Phases and counts, in the order they first turned up
+        self.counts = set()  # The names that are counts
+        self.recent = {}  # name -> deque of the last window values
+        self.trace = []  # Every frame, as a dict
+        self.frame = {}
+        self.last = None
+        self.font = None
+
+    def begin(self):
+        """Start a frame."""
+        self.frame = {}
+        self.last = self.timer()
+
+    def lap(self, phase):
+        now = self.timer()
+        self.record(phase, now - self.last + self.frame.get(phase, 0))
+        self.last = now
+
+    def count(self, name, value):
+        self.counts.add(name)
+        self.record(name, value)
+
+    def record(self, name, value):
+        if name not in self.recent:
+            self.names.append(name)
+            self.recent[name] = collections.deque(maxlen=self.window)
+        self.frame[name] = value
+
+    def endframe(self):
+        for name, value in self.frame.items():
+            self.recent[name].append(value)
+        if self.keep:
+            self.trace.append(self.frame)
+        self.frame = {}
+
+    def percentiles(self, name, ps=(50, 95, 99)):
+        values = self.recent.get(name)
+        if not values:
+            return [0] * len(ps)
+        return list(numpy.percentile(list(values), ps))
+
+    def report(self):
+        """Return lines of text: p50/p95/p99 for every phase (in ms) and count."""
+        lines = []
+        for name in self.names:
+            if name in self.counts:
+                lines.append('%-10s %8.0f %8.0f %8.0f' % tuple([name] + self.percentiles(name)))
+            else:
+                lines.append('%-10s %7.2fms %7.2fms %7.2fms' % tuple([name] + [1000*t for t in self.percentiles(name)]))
+        return ['%-10s %9s %9s %9s' % ('', 'p50', 'p95', 'p99')] + lines
+
+    def draw(self, screen):
+        """Draw the report in the top left corner. Returns the rectangle drawn on."""
+        if not self.font:
+            pygame.font.init()
+            self.font = pygame.font.Font(None, 18)
+        lines = self.report()
+        height = self.font.get_linesize()
+        rect = pygame.Rect(10, 30, 0, 0)
+        for n, line in enumerate(lines):
+            text = self.font.render(line, True, (255, 255, 0))
+            rect = rect.union(screen.blit(text, (10, 30 + n * height)))
+        return rect
+
+    def dump(self, filename):
+        """Write every frame to filename, as CSV (or JSON, if it ends in .json)."""
+        if filename.endswith('.json'):
+            with open(filename, 'w') as f:
+                json.dump([dict((name, float(value)) for name, value in frame.items()) for frame in self.trace], f)
+            return
+        with open(filename, 'wb') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.names)
+            for frame in self.trace:
+                writer.writerow([frame.get(name, '') for name in self.names])
+
+### End class Profiler
+
+
+class StartupTimer:
+    """How long starting up took, one step at a time.
+
+    lap(name) charges the time since the last lap (or the start) to name.
+    Things finishing in another thread, like the sounds, call done(name)
+    instead, which just notes how long after the start that was."""
+
+    def __init__(self, start=None, timer=timeit.default_timer):
+        self.timer = timer
+        if start is None:
+            start = timer()
+        self.start = self.last = start
+        self.laps = []  # (name, seconds)
+        self.background = []  # (name, seconds since the start)
+
+    def lap(self, name):
+        now = self.timer()
+        self.laps.append((name, now - self.last))
+        self.last = now
+
+    def done(self, name):
+        self.background.append((name, self.timer() - self.start))
+
+    def total(self):
+        return self.last - self.start
+
+    def report(self):
+        """Return the report, as a list of lines."""
+        lines = ['%-12s %7.1fms' % (name, 1000 * t) for name, t in self.laps]
+        lines.append('%-12s %7.1fms' % ('total', 1000 * self.total()))
+        for name, t in self.background:
+            lines.append('%-12s %7.1fms after the start (in the background)' % (name, 1000 * t))
+        return lines
+
+### End class StartupTimer
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+"""Play Spacewar with no screen, no speakers and no clock.
+
+    python spacewar_headless.py [matches] [max ticks]
+
+The physics runs one tick per step as fast as the CPU allows. Images are
+just rectangles (their sizes set the radii) and sounds are silent, so this
+works on servers without a display, for balance testing and AI training.
+Without a human at the keyboard, each ship is flown by a "pilot": anything
+that, given the ship and the game, says which of its keys are held down."""
+
+import random, sys, time
+
+import pygame
+
+from spacewar_func import *
+
+
+class KeyState(dict):
+    """Stands in for pygame.key.get_pressed(): keys not pressed are 0."""
+
+    def __missing__(self, key):
+        return 0
+
+### End class KeyState
+
+
+class RandomPilot:
+    """Mashes keys at random. Each key is held for a random number of ticks."""
+
+    def __init__(self, seed=None, hold=10):
+        self.random = random.Random(seed)
+        self.hold = hold
+        self.held = {}  # key -> (pressed, ticks left)
+
+    def __call__(self, ship, gamestate, keystate):
+        for key in (ship.thrustkey, ship.leftkey, ship.rightkey, ship.shootkey):
+            pressed, ticks = self.held.get(key, (0, 0))
+            if ticks <= 0:
+                pressed, ticks = self.random.random() < 0.5, self.random.randint(1, self.hold)
+            self.held[key] = (pressed, ticks - 1)
+            keystate[key] = int(pressed)
+
+### End class RandomPilot
+
+
+def headless_gamestate(config=None):
+    """Return a headless GameState with nothing in it."""
+    gamestate = GameState(config, headless=True)
+    gamestate.load_sounds()
+    return gamestate
+
+def play(pilots=None, seed=0, maxticks=10000, config=None):
+    """Play one match headlessly, until a ship dies or maxticks have passed.
+
+    pilots is a pair of pilots for the two ships (default: RandomPilots), and
+    config the game's settings (default: the usual ones).
+    Returns a dict: winner (1 or 2, or 0 for a draw), ticks, and each ship's
+    energy and shots fired."""
+    if pilots is None:
+        pilots = (RandomPilot(seed), RandomPilot(seed + 1))
+    gamestate = headless_gamestate(config)
+    ships = gamestate.new_game()
+    keystate = KeyState()
+    ticks = 0
+    while ticks < maxticks and len(gamestate.ships) == len(ships):
+        for ship, pilot in zip(ships, pilots):
+            pilot(ship, gamestate, keystate)
+        gamestate.step(keystate)
+        ticks = ticks + 1
+    return outcome(ships, ticks)
+
+def outcome(ships, ticks):
+    """How a match went: winner (1 or 2, or 0 for a draw), ticks, and each ship's energy and shots fired."""
+    alive = [ship.alive() for ship in ships]
+    if alive.count(True) == 1:
+        winner = alive.index(True) + 1
+    else:
+        winner = 0
+    return {'winner': winner,
+            'ticks': ticks,
+            'energy': [ship.meter.value for ship in ships],
+            'shots': [ship.shotsfired for ship in ships]}
+
+
+if __name__ == '__main__':
+    matches = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    maxticks = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    ticks = 0
+    start = time.time()
+    for seed in xrange(matches):
+        result = play(seed=2 * seed, maxticks=maxticks)
+        ticks = ticks + result['ticks']
+        print seed, result
+    elapsed = time.time() - start
+    print '%d matches, %d ticks in %.2fs (%.0f ticks/s)' % (matches, ticks, elapsed, ticks / elapsed)
@@ -0,0 +1,587 @@
+#!/usr/bin/env python
+
+"""Vectorized physics for my Spacewar program.
+
+Every Body's position, velocity, acceleration, mass and radius lives in one
+row of a few big numpy arrays owned by a World. Moving everything for a tick
+is then a handful of array operations, rather than a pile of tiny 2-element
+arrays per Body."""
+
+import math
+
+import numpy
+
+
+class World:
+    """Structure-of-arrays storage for all the Bodys in a game.
+
+    A Body owns a "slot" (a row number) in here. Dead slots have alive == False
+    and are handed out again to the next Body that's born.
+
+    If swept is true, Bodys collide if they touched at any time during the
+    last step(), not just where they ended up, so fast shots can't skip
+    through things. The broad phases then look at the whole of each Body's
+    path, too (see extents())."""
+
+    def __init__(self, area, capacity=64, swept=False):
+        self.area = area  # Anything with left, right, top & bottom, like a pygame.Rect
+        self.swept = swept
+        self.p      = numpy.zeros((capacity, 2))  # position
+        self.last   = numpy.zeros((capacity, 2))  # position before the last step()
+        self.v      = numpy.zeros((capacity, 2))  # velocity
+        self.a      = numpy.zeros((capacity, 2))  # acceleration
+        self.mass   = numpy.zeros(capacity)
+        self.radius = numpy.zeros(capacity)
+        self.alive  = numpy.zeros(capacity, dtype=bool)
+        self.kind   = numpy.zeros(capacity, dtype=numpy.int16)  # What sort of Body, for sorting out collisions
+        self.bodies = [None] * capacity  # slot -> Body, to get from the arrays back to the sprites
+        self.free = range(capacity - 1, -1, -1)  # pop() hands out the lowest slots first
+
+    def __len__(self):
+        """Return the number of living Bodys."""
+        return int(self.alive.sum())
+
+    def capacity(self):
+        return len(self.alive)
+
+    def add(self, body, p, v=(0, 0), mass=1.0, radius=0.0, kind=0):
+        """Give body a slot, initialized with the given state. Returns the slot."""
+        if not self.free:
+            self.grow()
+        slot = self.free.pop()
+        self.p[slot] = self.last[slot] = p
+        self.v[slot] = v
+        self.a[slot] = 0
+        self.mass[slot] = mass
+        self.radius[slot] = radius
+        self.alive[slot] = True
+        self.kind[slot] = kind
+        self.bodies[slot] = body
+        return slot
+
+    def remove(self, slot):
+        """Free up a slot. Removing a dead slot does nothing."""
+        if not self.alive[slot]:
+            return
+        self.alive[slot] = False
+        self.v[slot] = 0
+        self.a[slot] = 0
+        self.bodies[slot] = None
+        self.free.append(slot)
+
+    def grow(self):
+        """Double the size of every array."""
+        old = self.capacity()
+        for name in ('p', 'last', 'v', 'a', 'mass', 'radius', 'alive', 'kind'):
+            arr = getattr(self, name)
+            new = numpy.zeros((2 * old,) + arr.shape[1:], dtype=arr.dtype)
+            new[:old] = arr
+            setattr(self, name, new)
+        self.bodies.extend([None] * old)
+        self.free[:0] = range(2 * old - 1, old - 1, -1)
+
+    def clear(self, capacity=0):
+        """Empty every slot at once (without telling the Bodys), and make room for at least capacity."""
+        while self.capacity() < capacity:
+            self.grow()
+        for name in ('p', 'last', 'v', 'a', 'mass', 'radius', 'alive', 'kind'):
+            getattr(self, name)[...] = 0
+        self.bodies = [None] * self.capacity()
+        self.free = range(self.capacity() - 1, -1, -1)
+
+    def live(self):
+        """Return the slots of all living Bodys, in slot order."""
+        return self.alive.nonzero()[0]
+
+    def kick(self, dt):
+        """Change velocities by the accelerations, over a time dt (in ticks)."""
+        self.v += dt * self.a
+
+    def drift(self, dt):
+        """Change positions by the velocities, over a time dt (in ticks)."""
+        if dt == 1.0:
+            self.p += self.v
+        else:
+            self.p += dt * self.v
+
+    def bound(self, walls):
+        """Bounce everything that's gone through a wall back, or with no walls, wrap it round."""
+        p, v, r, alive, area = self.p, self.v, self.radius, self.alive, self.area
+        for axis, lo, hi in ((0, area.left, area.right), (1, area.top, area.bottom)):
+            x = p[:, axis]  # A view, so writing to x writes to p
+            if walls:
+                low = alive & (x - r < lo)
+                v[low, axis] = -v[low, axis]
+                x[low] = 2 * (lo + r[low]) - x[low]
+                high = alive & (x + r > hi)
+                v[high, axis] = -v[high, axis]
+                x[high] = 2 * (hi - r[high]) - x[high]
+            else:   ### Toroidal universe (not very precise)
+                x[alive & (x < lo)] = hi
+                x[alive & (x > hi)] = lo
+
+    def limit(self, maxspeed):
+        """Slow down anything going faster than maxspeed."""
+        v = self.v
+        speed_sqrd = (v * v).sum(1)
+        fast = speed_sqrd > maxspeed ** 2
+        if fast.any():
+            v[fast] *= (maxspeed / numpy.sqrt(speed_sqrd[fast]))[:, numpy.newaxis]
+
+    def wrap(self, d):
+        """Make the displacements d the short way round, across the edges (in place). Returns d."""
+        size = numpy.array((self.area.width, self.area.height), dtype=float)
+        d -= size * numpy.round(d / size)
+        return d
+
+    def moves(self, slots, walls):
+        """How far each of the slots moved in the last step()."""
+        d = self.p[slots] - self.last[slots]
+        if not walls:
+            self.wrap(d)  # Wrapping from one edge to the other was only a short move
+        return d
+
+    def extents(self, slots, walls):
+        """Circles the broad phases should check for the slots: (centers, radii).
+
+        Usually just where the Bodys are; when swept, circles around their
+        whole paths in the last step()."""
+        if not self.swept:
+            return self.p[slots], self.radius[slots]
+        d = self.moves(slots, walls)
+        return self.p[slots] - d / 2, self.radius[slots] + numpy.sqrt((d * d).sum(1)) / 2
+
+    def impacts(self, i, j, walls):
+        """When did each of the pairs of slots (i[k], j[k]) first touch during the last step()?
+
+        Returns the times, as fractions of the step (0 if they were touching
+        all along), or inf where they didn't touch -- or only touched at the
+        start, and were already coming apart after bouncing off each other
+        last tick. The Bodys are taken to have moved in straight lines."""
+        r0 = self.last[i] - self.last[j]
+        if not walls:
+            self.wrap(r0)
+        d = self.moves(i, walls) - self.moves(j, walls)  # How far i moved, as seen from j
+
+        # |r0 + t*d| == radii, a quadratic in t.
+        a = (d * d).sum(1)
+        b = (r0 * d).sum(1)
+        c = (r0 * r0).sum(1) - (self.radius[i] + self.radius[j]) ** 2
+        disc = b * b - a * c
+        closing = (b < 0) & (disc >= 0)
+        t = numpy.where(closing, (-b - numpy.sqrt(numpy.where(closing, disc, 0))) / numpy.where(closing, a, 1), numpy.inf)
+        t[t > 1] = numpy.inf
+        end = c + 2 * b + a  # Touching at the end if this <= 0
+        t[c <= 0] = numpy.where(end[c <= 0] <= 0, 0, numpy.inf)
+        return t
+
+    def touching(self, i, j, walls):
+        """Narrow phase: which of the pairs of slots (i[k], j[k]) intersect?
+
+        When swept: which of them touched at any time during the last step()?"""
+        if self.swept:
+            return self.impacts(i, j, walls) <= 1
+        d = self.p[i] - self.p[j]
+        if not walls:  # The short way round, across the edges
+            self.wrap(d)
+        return (d * d).sum(1) <= (self.radius[i] + self.radius[j]) ** 2
+
+### End class World
+
+
+# Broad phase collision detection
+#
+# Checking every pair of Bodys is O(n**2). A broad phase cheaply finds the
+# pairs that *might* be touching ("candidates"), as two arrays of slots i, j,
+# and World.touching() then checks just those.
+
+def _ranges(starts, ends):
+    """Flatten a bunch of ranges [start, end) without a Python loop.
+
+    Returns (which, index): index runs through every range, and which says
+    which range each index came from."""
+    counts = numpy.maximum(ends - starts, 0)
+    which = numpy.repeat(numpy.arange(len(counts)), counts)
+    index = numpy.arange(counts.sum()) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+    return which, index + numpy.repeat(starts, counts)
+
+def _unique_pairs(i, j, n):
+    """Put each pair the right way round (i < j) and drop self-pairs and repeats."""
+    i, j = numpy.minimum(i, j), numpy.maximum(i, j)
+    keys = numpy.unique((i * n + j)[i != j])
+    return keys // n, keys % n
+
+class BruteForce:
+    """Every pair is a candidate. Fine for a handful of Bodys."""
+
+    def pairs(self, world, walls):
+        live = world.live()
+        i, j = numpy.triu_indices(len(live), 1)
+        return live[i], live[j]
+
+### End class BruteForce
+
+
+class GridBroadPhase:
+    """Uniform grid (spatial hash) broad phase.
+
+    The world is chopped into cells about as big as most Bodys, and each
+    Body goes in every cell its bounding box overlaps: usually one to four,
+    more for the sun or a fast swept shot. Bodys can only touch if they
+    share a cell. Without walls, the cells wrap around the edges too."""
+
+    def __init__(self, cellsize=None, crowd=32):
+        self.cellsize = cellsize  # None = pick one from the Bodys' radii each tick
+        self.crowd = crowd  # With fewer Bodys than this, checking every pair is quicker
+
+    def pairs(self, world, walls):
+        live = world.live()
+        if len(live) < self.crowd:
+            return BruteForce().pairs(world, walls)
+        (p, r), area = world.extents(live, walls), world.area
+        size = float(self.cellsize or max(2 * numpy.percentile(r, 90), 1.0))
+        # The cells exactly tile the world (so that wrapping round works), so
+        # they may come out a bit bigger than size.
+        nx = max(int(area.width // size), 1)
+        ny = max(int(area.height // size), 1)
+        sx, sy = area.width / float(nx), area.height / float(ny)
+
+        # The range of cells each Body's bounding box covers.
+        x0 = numpy.floor((p[:, 0] - r - area.left) / sx).astype(int)
+        x1 = numpy.floor((p[:, 0] + r - area.left) / sx).astype(int)
+        y0 = numpy.floor((p[:, 1] - r - area.top) / sy).astype(int)
+        y1 = numpy.floor((p[:, 1] + r - area.top) / sy).astype(int)
+        if walls:
+            x0, x1 = numpy.clip(x0, 0, nx - 1), numpy.clip(x1, 0, nx - 1)
+            y0, y1 = numpy.clip(y0, 0, ny - 1), numpy.clip(y1, 0, ny - 1)
+        else:  # Once round the world is far enough
+            x1 = numpy.minimum(x1, x0 + nx - 1)
+            y1 = numpy.minimum(y1, y0 + ny - 1)
+        w = x1 - x0 + 1
+        body, k = _ranges(numpy.zeros(len(live), dtype=int), w * (y1 - y0 + 1))
+        cx, cy = x0[body] + k % w[body], y0[body] + k // w[body]
+        if not walls:
+            cx, cy = cx % nx, cy % ny
+        keys = cx * ny + cy
+
+        # Everybody after me in sorted order with the same cell. Bodys that
+        # share more than one cell turn up more than once.
+        order = keys.argsort(kind='mergesort')
+        sortedkeys = keys[order]
+        which, index = _ranges(numpy.arange(len(keys)) + 1, sortedkeys.searchsorted(sortedkeys, 'right'))
+        i, j = _unique_pairs(body[order[which]], body[order[index]], len(live))
+        return live[i], live[j]
+
+### End class GridBroadPhase
+
+
+class SweepAndPrune:
+    """Sort-and-sweep broad phase along x.
+
+    Every Body is an interval [x - radius, x + radius]; sorted by their left
+    ends, each Body only has to look ahead until the intervals stop
+    overlapping. Without walls, Bodys hanging over the left or right edge get
+    a ghost interval on the other side."""
+
+    def pairs(self, world, walls):
+        live = world.live()
+        (p, r), area = world.extents(live, walls), world.area
+        x = p[:, 0]
+        ids = numpy.arange(len(live))
+        lo, hi = x - r, x + r
+        if not walls:
+            left, right = lo < area.left, hi > area.right
+            ids = numpy.concatenate((ids, ids[left], ids[right]))
+            lo = numpy.concatenate((lo, lo[left] + area.width, lo[right] - area.width))
+            hi = numpy.concatenate((hi, hi[left] + area.width, hi[right] - area.width))
+
+        order = lo.argsort(kind='mergesort')
+        lo, hi, ids = lo[order], hi[order], ids[order]
+        which, index = _ranges(numpy.arange(len(lo)) + 1, lo.searchsorted(hi, 'right'))
+        # Sorted, i < j, like the other broad phases: collisions get dealt
+        # with in the order they come, so it has to be the same whichever finds them.
+        i, j = _unique_pairs(ids[which], ids[index], len(live))
+        return live[i], live[j]
+
+### End class SweepAndPrune
+
+
+# Gravity
+#
+# Each of these adds every Body's gravitational pull to the accelerations in a
+# World, the same way Body.pulledby() does: the pull is grav_const * mass / d**2
+# along the (not normalized) vector between them, and Bodys that are touching
+# don't pull each other at all. That also stops a Body from pulling itself.
+# "evaluations" counts the pulls worked out in the last apply().
+
+def _pull(world, targets, sources, grav_const):
+    """Add the pull of every source slot on every target slot. Returns the number of pulls worked out."""
+    if not len(targets) or not len(sources):
+        return 0
+    ps, ms, rs = world.p[sources], world.mass[sources], world.radius[sources]
+    chunk = max(1, 2 ** 20 // len(sources))  # Keep the temporary arrays to about a million pairs
+    for start in xrange(0, len(targets), chunk):
+        t = targets[start:start + chunk]
+        d = ps[numpy.newaxis] - world.p[t][:, numpy.newaxis]
+        d2 = (d * d).sum(2)
+        apart = d2 > (world.radius[t][:, numpy.newaxis] + rs) ** 2
+        g = numpy.where(apart, grav_const * ms / numpy.where(apart, d2, 1), 0)
+        world.a[t] += (g[:, :, numpy.newaxis] * d).sum(1)
+    return len(targets) * len(sources)
+
+class AllPairsGravity:
+    """Every Body pulls every other Body. Exact, but O(n**2)."""
+
+    def __init__(self):
+        self.evaluations = 0
+
+    def apply(self, world, grav_const):
+        live = world.live()
+        self.evaluations = _pull(world, live, live, grav_const)
+
+### End class AllPairsGravity
+
+
+class MassiveGravity:
+    """Only Bodys of at least threshold mass (suns) pull. O(n * suns).
+
+    A shot's pull on another shot is thousands of times weaker than the
+    sun's, so this is nearly the same as AllPairsGravity."""
+
+    def __init__(self, threshold=100):
+        self.threshold = threshold
+        self.evaluations = 0
+
+    def apply(self, world, grav_const):
+        live = world.live()
+        sources = live[world.mass[live] >= self.threshold]
+        self.evaluations = _pull(world, live, sources, grav_const)
+
+### End class MassiveGravity
+
+
+class BarnesHutGravity:
+    """Barnes-Hut: far-away clumps of Bodys pull as one. O(n log n).
+
+    The Bodys are sorted into a quadtree, and a node of width s at distance d
+    is treated as a single body at its center of mass when s/d < theta.
+    Smaller theta is more accurate and slower; theta = 0 is exact.
+
+    Walking the tree costs more per Body than AllPairsGravity's arrays do,
+    so it only pays off for big crowds: at theta = 0.5 it was about as
+    quick at 300 Bodys, twice as quick at 1000 and six times as quick at
+    5000 (spacewar_bench.py --compare says where it is on your machine).
+    Below a few hundred, use AllPairsGravity."""
+
+    MAX_DEPTH = 32  # Bodys closer together than this many halvings share a node
+
+    def __init__(self, theta=0.5):
+        self.theta = theta
+        self.evaluations = 0
+
+    def build(self, p, m, r):
+        """Build the quadtree for positions p, masses m and radii r.
+
+        Nodes are kept in flat arrays; the children of node k are
+        children[first[k]:first[k] + count[k]]. A leaf holds exactly one body.
+
+        It's built a level at a time, for every node on the level at once:
+        each Body's cell at the deepest level is worked out first, and
+        which quarter of its node it goes in on the next level down is just
+        the next bit of that. (One Python call per node took longer than
+        working out every pull directly, for anything under a thousand Bodys.)"""
+        n, depth = len(p), self.MAX_DEPTH
+        lo, hi = p.min(0), p.max(0)
+        size = max(hi - lo) or 1.0
+        cells = numpy.minimum(((p - lo) / size * 2.0 ** depth).astype(numpy.int64), 2 ** depth - 1)
+        levels = []  # (com, mass, size, radius, first, count) of each level's nodes
+        body = numpy.arange(n)
+        node = numpy.zeros(n, dtype=numpy.int64)  # Which of this level's nodes each body is in
+        nodes, before, level = 1, 0, 0  # before: how many nodes the levels above have
+        while len(body):
+            count = numpy.bincount(node, minlength=nodes)
+            mass = numpy.bincount(node, m[body], nodes)
+            com = numpy.column_stack([numpy.bincount(node, m[body] * p[body, k], nodes) for k in (0, 1)])
+            mean = numpy.column_stack([numpy.bincount(node, p[body, k], nodes) for k in (0, 1)]) / count[:, numpy.newaxis]
+            heavy = mass > 0
+            com[heavy] /= mass[heavy, numpy.newaxis]
+            com[~heavy] = mean[~heavy]
+            alone = count[node] == 1
+            radius = numpy.zeros(nodes)
+            radius[node[alone]] = r[body[alone]]  # Only leaves can be "touching"
+
+            # The rest go down a level: into a quarter of their node, or
+            # past MAX_DEPTH, into a leaf each.
+            body, parent = body[~alone], node[~alone]
+            if level < depth:
+                bit = depth - 1 - level
+                key = parent * 4 + ((cells[body, 0] >> bit) & 1) + 2 * ((cells[body, 1] >> bit) & 1)
+                keys, node = numpy.unique(key, return_inverse=True)
+                kids = numpy.bincount(keys // 4, minlength=nodes)
+            else:
+                key = parent * n + body
+                keys, node = numpy.unique(key, return_inverse=True)
+                kids = numpy.bincount(keys // n, minlength=nodes)
+            first = before + nodes + numpy.cumsum(kids) - kids
+            levels.append((com, mass, numpy.repeat(size / 2.0 ** level if level <= depth else 0.0, nodes), radius,
+                           first, kids))
+            before, nodes, level = before + nodes, len(keys), level + 1
+
+        for name, parts in zip(('com', 'mass', 'size', 'radius', 'first', 'count'), zip(*levels)):
+            setattr(self, name, numpy.concatenate(parts))
+        self.children = numpy.arange(len(self.mass))  # A node's children are all together, a level down
+
+    def apply(self, world, grav_const):
+        live = world.live()
+        self.evaluations = 0
+        if not len(live):
+            return
+        p, r = world.p[live], world.radius[live]
+        self.build(p, world.mass[live], r)
+
+        # Walk the tree for every body at once. Each (body, node) pair either
+        # gets worked out (leaf, or far enough away) or is replaced by
+        # (body, child) for each of the node's children.
+        body = numpy.arange(len(live))
+        node = numpy.zeros(len(live), dtype=int)
+        while len(body):
+            d = self.com[node] - p[body]
+            d2 = (d * d).sum(1)
+            done = (self.count[node] == 0) | (self.size[node] ** 2 < self.theta ** 2 * d2)
+            pull = done & (d2 > (r[body] + self.radius[node]) ** 2)
+            g = grav_const * self.mass[node[pull]] / d2[pull]
+            numpy.add.at(world.a, live[body[pull]], g[:, numpy.newaxis] * d[pull])
+            self.evaluations += done.sum()
+
+            body, node = body[~done], node[~done]
+            which, index = _ranges(self.first[node], self.first[node] + self.count[node])
+            body, node = body[which], self.children[index]
+
+### End class BarnesHutGravity
+
+
+# Integrators
+#
+# These move a World along one tick -- velocities get the accelerations,
+# positions get the velocities, then walls (or wrapping) and the speed
+# limit are applied, and all acceleration is removed for the next tick --
+# working out gravity themselves, as many times as they need to. world.a comes in
+# holding the tick's accelerations that don't depend on where things are
+# (thrust), and gravitate() adds gravity at the current positions to
+# world.a. A tick can be split into substeps, with gravity worked out for
+# each: more accurate orbits at more cost. With courant set, the number of
+# substeps goes up (to at most maxsubsteps) whenever a Body would otherwise
+# move more than courant times its distance from a massive one in a substep.
+# "evaluations" counts the gravitate() calls in the last advance().
+
+def _substeps(world, walls, substeps, courant, maxsubsteps, threshold):
+    """How many substeps the next tick needs."""
+    if not courant:
+        return substeps
+    live = world.live()
+    heavy = live[world.mass[live] >= threshold]
+    if not len(heavy):
+        return substeps
+    nearest = numpy.inf
+    for h in heavy:
+        d = world.p[live] - world.p[h]
+        if not walls:
+            world.wrap(d)
+        # How far from its surface. (The sun itself, and anything touching it, gets 1.)
+        d = numpy.maximum(numpy.sqrt((d * d).sum(1)) - world.radius[h], 1.0)
+        nearest = numpy.minimum(nearest, d)
+    speed = numpy.sqrt((world.v[live] ** 2).sum(1))
+    needed = int(math.ceil((speed / (courant * nearest)).max()))
+    return min(max(needed, substeps), maxsubsteps)
+
+class Integrator:
+    """The substepping common to all the integrators. Subclasses write run()."""
+
+    def __init__(self, substeps=1, courant=None, maxsubsteps=16, threshold=100):
+        self.substeps = substeps
+        self.courant = courant
+        self.maxsubsteps = maxsubsteps
+        self.threshold = threshold  # What counts as massive, for courant
+        self.evaluations = 0
+        self.used = substeps  # Substeps in the last advance()
+
+    def advance(self, world, walls, maxspeed, gravitate):
+        world.last[:] = world.p
+        fixed = world.a.copy()
+        self.evaluations = 0
+        def accelerate():
+            world.a[:] = fixed
+            gravitate()
+            self.evaluations = self.evaluations + 1
+        self.used = _substeps(world, walls, self.substeps, self.courant, self.maxsubsteps, self.threshold)
+        self.run(world, walls, accelerate, self.used, 1.0 / self.used)
+        world.limit(maxspeed)
+        world.a[:] = 0
+
+### End class Integrator
+
+
+class Euler(Integrator):
+    """Explicit Euler: move, then speed up. Energy creeps up every orbit, so
+    orbits spiral outwards. Just here for comparison."""
+
+    def run(self, world, walls, accelerate, n, h):
+        for k in xrange(n):
+            accelerate()
+            world.drift(h)
+            world.kick(h)
+            world.bound(walls)
+
+### End class Euler
+
+
+class SemiImplicitEuler(Integrator):
+    """Speed up, then move (the game's default INTEGRATOR). First order, but
+    symplectic: energy wobbles about rather than drifting away."""
+
+    def run(self, world, walls, accelerate, n, h):
+        for k in xrange(n):
+            accelerate()
+            world.kick(h)
+            world.drift(h)
+            world.bound(walls)
+
+### End class SemiImplicitEuler
+
+
+class Leapfrog(Integrator):
+    """Velocity Verlet (kick-drift-kick leapfrog): half a kick, a whole move,
+    then half a kick with gravity where the Bodys have got to. Second order
+    and symplectic, for one more gravity evaluation per tick."""
+
+    def run(self, world, walls, accelerate, n, h):
+        accelerate()
+        for k in xrange(n):
+            world.kick(h / 2)
+            world.drift(h)
+            world.bound(walls)
+            accelerate()
+            world.kick(h / 2)
+
+### End class Leapfrog
+
+
+INTEGRATORS = {'euler': Euler, 'symplectic': SemiImplicitEuler, 'leapfrog': Leapfrog}
+
+
+def energy(world, grav_const, threshold=0):
+    """The total energy of the living Bodys, to see how well an integrator keeps it.
+
+    Pulls here go as 1/d (see _pull), so the potential energy of a pair is
+    grav_const * m1 * m2 * ln(d). Only Bodys of at least threshold mass are
+    counted as pulling, as with MassiveGravity, and touching Bodys don't
+    pull at all."""
+    live = world.live()
+    p, v, m, r = world.p[live], world.v[live], world.mass[live], world.radius[live]
+    total = 0.5 * (m * (v * v).sum(1)).sum()
+    for k in (m >= threshold).nonzero()[0]:
+        d = numpy.sqrt(((p - p[k]) ** 2).sum(1))
+        apart = d > r + r[k]
+        share = numpy.where(m >= threshold, 0.5, 1.0)  # Pairs of massive Bodys turn up twice
+        total += (grav_const * m[k] * m * share * numpy.log(numpy.where(apart, d, 1)))[apart].sum()
+    return total
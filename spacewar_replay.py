@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+
+"""Record the keys pressed in a game of Spacewar, and play them back headlessly.
+
+    python spacewar.py --record session.swr
+    python spacewar_replay.py session.swr [--trace trace.csv]
+
+A recording is the game's settings, one byte per tick (a bit for each of
+the eight ship keys, so nothing else on the keyboard is kept), and a
+checksum of where everything ended up. Playing it back steps a headless
+game through the same keys as fast as it'll go, and checks that it ends up
+in exactly the same place -- so it's a repeatable load test, too."""
+
+import json, optparse, sys, timeit, zlib
+
+from spacewar_func import *
+from spacewar_headless import KeyState, headless_gamestate
+
+MAGIC = 'SWREC1\n'
+
+
+def checksum(gamestate):
+    """A CRC of the physical state of every Body, and the ships' angles and energy."""
+    world = gamestate.world
+    live = world.live()
+    crc = zlib.crc32(live.astype('int32').tostring())
+    for arr in (world.p, world.v, world.mass, world.radius):
+        crc = zlib.crc32(arr[live].tostring(), crc)
+    for body in world.bodies:
+        if isinstance(body, Ship):
+            crc = zlib.crc32('%r %r' % (body.angle, body.meter.value), crc)
+    return crc & 0xffffffff
+
+
+class Recorder:
+    """Keeps the ship keys held down each tick."""
+
+    def __init__(self, config):
+        self.config = config
+        self.keys = tuple(config.SHIP1_KEYS) + tuple(config.SHIP2_KEYS)
+        self.ticks = bytearray()
+
+    def record(self, keystate):
+        bits = 0
+        for n, key in enumerate(self.keys):
+            if keystate[key]:
+                bits = bits | 1 << n
+        self.ticks.append(bits)
+
+    def save(self, filename, gamestate):
+        """Write the recording, with the checksum of gamestate as it is now."""
+        settings = dict((name, getattr(self.config, name)) for name in Config.NAMES)
+        header = {'config': settings, 'ticks': len(self.ticks), 'checksum': checksum(gamestate)}
+        with open(filename, 'wb') as f:
+            f.write(MAGIC)
+            f.write(json.dumps(header, sort_keys=True) + '\n')
+            f.write(zlib.compress(str(self.ticks), 9))
+
+### End class Recorder
+
+
+def load(filename):
+    """Read a recording. Returns (config, ticks as a bytearray, checksum)."""
+    with open(filename, 'rb') as f:
+        if f.readline() != MAGIC:
+            raise ValueError('%s is not a Spacewar recording' % filename)
+        header = json.loads(f.readline())
+        ticks = bytearray(zlib.decompress(f.read()))
+    settings = {}
+    for name, value in header['config'].items():
+        if isinstance(value, list):
+            value = tuple(value)
+        settings[str(name)] = value
+    if len(ticks) != header['ticks']:
+        raise ValueError('%s is cut short' % filename)
+    return Config(**settings), ticks, header['checksum']
+
+def replay(filename, profiler=None):
+    """Play a recording back headlessly.
+
+    Returns (gamestate at the end, ticks per second, whether it ended up
+    where the recording did)."""
+    config, ticks, expected = load(filename)
+    gamestate = headless_gamestate(config)
+    gamestate.profiler = profiler
+    gamestate.new_game()
+    keys = tuple(config.SHIP1_KEYS) + tuple(config.SHIP2_KEYS)
+    keystate = KeyState()
+    start = timeit.default_timer()
+    for bits in ticks:
+        for n, key in enumerate(keys):
+            keystate[key] = bits >> n & 1
+        if profiler: profiler.begin()
+        gamestate.step(keystate)
+        if profiler: profiler.endframe()
+    elapsed = timeit.default_timer() - start
+    return gamestate, len(ticks) / max(elapsed, 1e-9), checksum(gamestate) == expected
+
+
+if __name__ == '__main__':
+    parser = optparse.OptionParser(usage='%prog RECORDING [options]')
+    parser.add_option('--trace', help='write every tick\'s timings here (.csv or .json)')
+    options, args = parser.parse_args()
+    if len(args) != 1:
+        parser.error('which recording?')
+
+    profiler = Profiler()
+    gamestate, rate, ok = replay(args[0], profiler)
+    print '%d ticks at %.0f ticks/s' % (len(profiler.trace), rate)
+    print '\n'.join(profiler.report())
+    if options.trace:
+        profiler.dump(options.trace)
+    if not ok:
+        print 'MISMATCH: the replay did not end up where the recording did'
+        sys.exit(1)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+
+"""Games of Spacewar with any number of ships and suns, from a file.
+
+    python spacewar_scenario.py scenarios/armada.json [ticks]
+    python spacewar.py --scenario scenarios/armada.json
+
+A scenario is a JSON file like this (every part of it can be left out):
+
+    {"settings": {"WORLD_WIDTH": 4000, "WORLD_HEIGHT": 3000, "WALLS": 0},
+     "suns":  [{"p": [1000, 1000], "mass": 4000}, {"p": [3000, 2000]}],
+     "ships": [{"p": [200, 200], "v": [0, 1], "angle": 90, "player": 1},
+               {"p": [3800, 2800], "player": 2},
+               {"count": 62, "seed": 1, "speed": 2}],
+     "shots": [{"count": 5000, "seed": 2, "speed": 4, "timeleft": 1000}]}
+
+settings are Config settings (so WORLD_WIDTH and WORLD_HEIGHT make the
+world bigger than the screen). Each entry in suns, ships and shots is
+either one Body -- where it is, and optionally its velocity, a sun's mass,
+a ship's angle -- or a field of count of them, scattered at random (from
+seed) over the world, at least margin away from any sun (and shots from
+any ship), in random directions at up to speed. Shots' timeleft is how
+many ticks they last (SHOT_LIFESPAN, if it's left out).
+
+Ships with a player (1 or 2) get that player's keys and meter; the rest are
+flown by the computer (see build()). From the command line, the computer
+flies every ship, with no screen, and it says how long the ticks took
+against the time there is for one (1 / TICK_RATE)."""
+
+import json, math, optparse, time
+
+import numpy
+
+from spacewar_func import *
+from spacewar_headless import KeyState, headless_gamestate
+
+
+def load(filename):
+    """Read a scenario from a file. Returns it as a dict (see the module docstring)."""
+    scenario = json.load(open(filename))
+    for part in ('suns', 'ships', 'shots'):
+        for entry in scenario.get(part, []):
+            if 'count' not in entry and 'p' not in entry:
+                raise ValueError('%s: every one of the %s needs a "p" or a "count"' % (filename, part))
+    return scenario
+
+def scatter(count, area, seed=None, margin=0, avoid=(), speed=0):
+    """count random places in area, at least margin from each (p, radius) in avoid, and velocities up to speed.
+
+    Returns two (count, 2) arrays. Places that are too close get picked
+    again (so don't ask for more room than there is)."""
+    rand = numpy.random.RandomState(seed)
+    p = numpy.zeros((count, 2))
+    todo = numpy.arange(count)
+    for tries in xrange(100):
+        p[todo, 0] = rand.uniform(area.left, area.right, len(todo))
+        p[todo, 1] = rand.uniform(area.top, area.bottom, len(todo))
+        ok = numpy.ones(len(todo), dtype=bool)
+        for (x, y), radius in avoid:
+            ok &= numpy.hypot(p[todo, 0] - x, p[todo, 1] - y) >= radius + margin
+        todo = todo[~ok]
+        if not len(todo):
+            break
+    else:
+        raise ValueError("Can't find room for %d of them" % len(todo))
+    heading = rand.uniform(0, 2 * math.pi, count)
+    v = rand.uniform(0, speed, count)[:, None] * numpy.column_stack((numpy.cos(heading), numpy.sin(heading)))
+    return p, v
+
+def entries(part, area, avoid):
+    """Every Body one part of a scenario has, as (p, v, entry) -- a field gives count of them."""
+    for entry in part:
+        if 'count' in entry:
+            p, v = scatter(entry['count'], area, entry.get('seed'), entry.get('margin', 100), avoid, entry.get('speed', 0))
+            for place, velocity in zip(p.tolist(), v.tolist()):
+                yield place, velocity, entry
+        else:
+            yield entry['p'], entry.get('v', (0, 0)), entry
+
+def configure(scenario):
+    """Return a Config with scenario's settings."""
+    return Config(**dict((str(name), value) for name, value in scenario.get('settings', {}).items()))
+
+def build(gamestate, scenario):
+    """Put everything in scenario into gamestate (an empty one, made with configure(scenario)'s settings).
+
+    Like GameState.new_game(), but returns (ships, players): every ship, in
+    order, and the player 1 and player 2 ships (None, if there isn't one).
+    Each ship without a player has keys of its own that no keyboard has (so
+    an AI can press them in a KeyState, see spacewar_ai) and a meter nobody
+    draws."""
+    config, area = gamestate.config, gamestate.world.area
+
+    suns = []
+    for p, v, entry in entries(scenario.get('suns', []), area, []):
+        sun = Sun(gamestate, gamestate.load_image("ball.png"), p, v)
+        sun.mass = entry.get('mass', config.SUN_MASS)
+        suns.append(sun)
+    avoid = [(tuple(sun.p), sun.radius) for sun in suns]
+
+    ships, players = [], [None, None]
+    for p, v, entry in entries(scenario.get('ships', []), area, avoid):
+        player = entry.get('player')
+        if player in (1, 2):
+            keys = (config.SHIP1_KEYS, config.SHIP2_KEYS)[player - 1]
+            meter_pos = (10, 10) if player == 1 else (config.DISP_WIDTH // 2 + 10, 10)  # Where new_game() puts them
+        else:
+            keys = tuple(('ai', len(ships), key) for key in ('thrust', 'left', 'right', 'shoot'))
+            meter_pos = (0, 0)
+        ship = Ship(gamestate, gamestate.load_image("ship.png"), p, keys, meter_pos, v)
+        ship.angle = float(entry.get('angle', 0.0))
+        ships.append(ship)
+        if player in (1, 2):
+            players[player - 1] = ship
+    avoid = avoid + [(tuple(ship.p), ship.radius) for ship in ships]
+
+    gamestate.shotpool.fill(gamestate)
+    for p, v, entry in entries(scenario.get('shots', []), area, avoid):
+        shot = gamestate.shotpool.acquire(gamestate, p, v)
+        if shot is not None:
+            shot.timeleft = entry.get('timeleft', config.SHOT_LIFESPAN)
+    if not gamestate.headless:
+        gamestate.explosionpool.fill(gamestate)
+    return ships, players
+
+
+if __name__ == '__main__':
+    parser = optparse.OptionParser(usage='%prog scenario.json [ticks]')
+    options, args = parser.parse_args()
+    if not args:
+        parser.error('which scenario?')
+    ticks = int(args[1]) if len(args) > 1 else 300
+
+    from spacewar_ai import HeuristicAI
+    scenario = load(args[0])
+    gamestate = headless_gamestate(configure(scenario))
+    build(gamestate, scenario)
+    gamestate.profiler = Profiler(keep=False)
+    ai = HeuristicAI()
+    keystate = KeyState()
+    times = []
+    for k in xrange(ticks):
+        start = time.time()
+        gamestate.profiler.begin()
+        fleet = [(gamestate, ship) for ship in gamestate.ships.sprites()]
+        ai.fly(fleet, [keystate] * len(fleet))
+        gamestate.profiler.lap('ai')
+        gamestate.step(keystate)
+        gamestate.profiler.endframe()
+        times.append(time.time() - start)
+    times = numpy.array(times) * 1000
+    budget = 1000.0 / gamestate.config.TICK_RATE
+    print '%d ticks: %.1fms a tick on average, %.1fms at worst (there are %.1fms for one)' % (
+        ticks, times.mean(), times.max(), budget)
+    print '%d ships and %d bodies left' % (len(gamestate.ships), len(gamestate.bodys))
+    print '\n'.join(gamestate.profiler.report())
@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+
+"""Save the state of a game of Spacewar, and put it back.
+
+    data = snapshot(gamestate)    # A string of bytes
+    ...play on...
+    restore(gamestate, data)      # Back to where it was
+    other = fork(gamestate)       # A new game, carrying on from the same place
+
+A snapshot has everything that decides what happens next: every Body's
+row of the World (position, velocity and so on, in the same slot), each
+ship's angle, shot timer, thrust, shots fired and energy, each shot's
+time left, the order the World hands out its spare slots in, and which
+shots the Pool would recycle first -- so a restored game plays on exactly as the
+original did, tick for tick, and gives the same checksum (see
+spacewar_replay). It doesn't have the Config (restore into a game with
+the same settings) or anything just for show, like explosions.
+
+Restoring reuses the Bodys already in the game where it can, and images
+come from the Assets, which have them already, so it's quick: for
+rollback, lookahead (fork, try something, throw the fork away) and
+checkpointing long runs. It's all fixed-size binary records, and
+snapshot(gamestate, compress=True) zlibs them too, which is slower but
+much smaller (and worth it for files)."""
+
+import copy, struct, zlib
+
+import numpy
+
+from spacewar_func import *
+
+MAGIC = 'SWSNAP2'
+
+# One record per living Body, per Ship (dead ones too: they keep their
+# energy and shots fired, and their place in GameState.fleet) and per Shot.
+# A ship's shot timer and energy are ints, unless the Config's SHOT_DELAY or
+# pains aren't, so they're kept as floats with a note of which they were
+# (checksum() would tell 7 from 7.0).
+BODY = numpy.dtype([('slot', '<i4'), ('kind', '<i2'), ('p', '<f8', 2), ('last', '<f8', 2), ('v', '<f8', 2),
+                    ('a', '<f8', 2), ('mass', '<f8'), ('radius', '<f8')])
+SHIP = numpy.dtype([('slot', '<i4'), ('angle', '<f8'), ('cantshoot', '<f8'), ('thrust', '<i1'),
+                    ('shotsfired', '<i4'), ('energy', '<f8'), ('floats', '<i1')])  # slot -1 = dead
+CANTSHOOT, ENERGY = 1, 2  # The bits of floats
+SHOT = numpy.dtype([('slot', '<i4'), ('timeleft', '<i4'), ('pooled', '<i1')])  # Pooled ones first, oldest first
+HEADER = struct.Struct('<7sBIIIII')  # MAGIC, compressed?, capacity, bodies, ships, shots, free slots
+
+# How to make a new one of each kind of Body that isn't a Ship or a Shot,
+# when there aren't enough of them already.
+MAKERS = {Sun: lambda gamestate: Sun(gamestate, gamestate.load_image("ball.png"), (0, 0))}
+
+
+def snapshot(gamestate, compress=False):
+    """Return the state of gamestate as a string of bytes."""
+    world = gamestate.world
+    live = world.live()
+    bodies = numpy.zeros(len(live), dtype=BODY)
+    bodies['slot'] = live
+    bodies['kind'] = world.kind[live]
+    for name in ('p', 'last', 'v', 'a', 'mass', 'radius'):
+        bodies[name] = getattr(world, name)[live]
+
+    ships = numpy.zeros(len(gamestate.fleet), dtype=SHIP)
+    for row, ship in zip(ships, gamestate.fleet):
+        row['slot'] = ship.slot if ship.alive() else -1
+        row['angle'], row['cantshoot'], row['thrust'] = ship.angle, ship.cantshoot, ship.thrust
+        row['shotsfired'], row['energy'] = ship.shotsfired, ship.meter.value
+        row['floats'] = isinstance(ship.cantshoot, float) * CANTSHOOT | isinstance(ship.meter.value, float) * ENERGY
+
+    pool = gamestate.shotpool
+    pooled = [shot for shot in pool.inuse if shot.alive()]
+    others = [body for body in world.bodies if isinstance(body, Shot) and body.pool is not pool]
+    shots = numpy.zeros(len(pooled) + len(others), dtype=SHOT)
+    shots['slot'] = [shot.slot for shot in pooled + others]
+    shots['timeleft'] = [shot.timeleft for shot in pooled + others]
+    shots['pooled'][:len(pooled)] = 1
+
+    free = numpy.array(world.free, dtype='<i4')
+    data = ''.join((bodies.tostring(), ships.tostring(), shots.tostring(), free.tostring()))
+    if compress:
+        data = zlib.compress(data, 6)
+    return HEADER.pack(MAGIC, int(bool(compress)), world.capacity(), len(bodies), len(ships), len(shots),
+                       len(free)) + data
+
+def unpack(data):
+    """Split a snapshot up. Returns (capacity, bodies, ships, shots, free slots)."""
+    magic, compressed, capacity, nbodies, nships, nshots, nfree = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError('Not a Spacewar snapshot')
+    data = data[HEADER.size:]
+    if compressed:
+        data = zlib.decompress(data)
+    arrays = []
+    offset = 0
+    for dtype, count in ((BODY, nbodies), (SHIP, nships), (SHOT, nshots), (numpy.dtype('<i4'), nfree)):
+        arrays.append(numpy.frombuffer(data, dtype=dtype, count=count, offset=offset))
+        offset = offset + dtype.itemsize * count
+    if offset != len(data):
+        raise ValueError('Snapshot is the wrong size')
+    bodies, ships, shots, free = arrays
+    return capacity, bodies, ships, shots, free
+
+def _number(row, name, bit):
+    """row[name], as the int or float it was when it was saved."""
+    if row['floats'] & bit:
+        return float(row[name])
+    return int(row[name])
+
+def restore(gamestate, data):
+    """Put gamestate back the way it was when data was snapshot() from it (or from one with the same ships)."""
+    capacity, bodies, ships, shots, free = unpack(data)
+    world, pool = gamestate.world, gamestate.shotpool
+    if len(ships) != len(gamestate.fleet):
+        raise ValueError('Snapshot has %d ships, the game has %d' % (len(ships), len(gamestate.fleet)))
+
+    # Bodys still in a slot the snapshot has one of their kind in stay put:
+    # rolling back a few ticks, that's nearly all of them. The rest are
+    # killed (shots go back to the Pool), keeping hold of anything that
+    # isn't a Ship or a Shot to use again.
+    slots, kinds = bodies['slot'].tolist(), bodies['kind'].tolist()
+    index = dict((slot, n) for n, slot in enumerate(slots))
+    fleet = dict((int(row['slot']), ship) for ship, row in zip(gamestate.fleet, ships) if row['slot'] >= 0)
+    pooled = dict(zip(shots['slot'].tolist(), shots['pooled'].astype(bool).tolist()))
+    placed = [None] * len(slots)
+    for n, (slot, kind) in enumerate(zip(slots, kinds)):
+        body = slot < world.capacity() and world.bodies[slot] or None
+        if body is None or body.kind != kind:
+            continue
+        if isinstance(body, Ship) and fleet[slot] is not body:
+            continue
+        if isinstance(body, Shot) and (body.pool is pool) != pooled[slot]:
+            continue
+        placed[n] = body
+    kept = set(placed)
+    spare = {}  # kind -> Bodys
+    for slot in world.live().tolist():
+        body = world.bodies[slot]
+        if body not in kept:
+            body.kill()
+            if not isinstance(body, (Ship, Shot)):
+                spare.setdefault(body.kind, []).append(body)
+
+    # Find (or make) a Body for every other slot. Anything made here goes
+    # into the World for a moment, before it's emptied.
+    classes = CollisionTable.classes
+    new = []
+    for n, (slot, kind) in enumerate(zip(slots, kinds)):
+        if placed[n] is not None:
+            continue
+        cls = classes[kind]
+        if slot in fleet:
+            body = fleet[slot]
+        elif slot in pooled:
+            if not pooled[slot]:
+                body = Shot.blank(gamestate)
+            elif pool.free:
+                body = pool.free.pop()
+            else:
+                body = pool.new(gamestate)
+        elif spare.get(kind):
+            body = spare[kind].pop()
+        elif cls in MAKERS:
+            body = MAKERS[cls](gamestate)
+            body.kill()
+        else:
+            raise ValueError("Can't make a new %s" % cls.__name__)
+        placed[n] = body
+        new.append(body)
+    pool.inuse.clear()
+    for slot in shots['slot'][shots['pooled'] == 1].tolist():
+        pool.inuse[placed[index[slot]]] = True  # Oldest first, as they were
+    # How many dead shots the Pool has spare doesn't matter: when it runs
+    # out, it makes new ones until there are capacity in use, same as ever.
+
+    # Now the World, just as it was...
+    world.clear(capacity)
+    for name in ('p', 'last', 'v', 'a', 'mass', 'radius', 'kind'):
+        getattr(world, name)[bodies['slot']] = bodies[name]
+    world.alive[bodies['slot']] = True
+    world.free = range(world.capacity() - 1, capacity - 1, -1) + free.tolist()  # Any room it's grown since comes last
+
+    # ...and the Bodys back in it.
+    for body, slot in zip(placed, slots):
+        body.slot = slot
+        world.bodies[slot] = body
+    gamestate.bodys.add(new)
+    for ship, row in zip(gamestate.fleet, ships):
+        ship.angle, ship.cantshoot, ship.thrust = float(row['angle']), _number(row, 'cantshoot', CANTSHOOT), int(row['thrust'])
+        ship.shotsfired = int(row['shotsfired'])
+        ship.meter.value = _number(row, 'energy', ENERGY)
+        ship.meter.decrease(0)  # Sets the width
+    for shot, row in zip([placed[index[slot]] for slot in shots['slot'].tolist()], shots):
+        shot.timeleft = int(row['timeleft'])
+    gamestate.ships.empty()
+    for ship in gamestate.fleet:  # In order, so they take turns the same way (dead ones' flames went with them)
+        if ship.alive():
+            ship.add(gamestate.ships)
+            if ship.thrust:
+                gamestate.flames.add(ship.flame)
+            else:
+                gamestate.flames.remove(ship.flame)
+    for body in placed:
+        body.place(body.p)
+
+def fork(gamestate):
+    """Return a new GameState carrying on from where gamestate is.
+
+    It has the same Config, Assets, sounds and collision responses, and
+    copies of the same broad phase, gravity and integrator, but Bodys of
+    its own: nothing that happens in one happens in the other."""
+    other = GameState(gamestate.config, gamestate.headless, gamestate.assets)
+    other.soundplay = dict(gamestate.soundplay)
+    other.responses = gamestate.responses
+    other.broadphase = copy.copy(gamestate.broadphase)
+    other.gravity = copy.copy(gamestate.gravity)
+    other.integrator = copy.copy(gamestate.integrator)
+    other.shotpool = Pool(Shot.blank, gamestate.shotpool.capacity, gamestate.shotpool.overflow)
+    other.explosionpool = Pool(Explosion.blank, gamestate.explosionpool.capacity, gamestate.explosionpool.overflow)
+    for ship in gamestate.fleet:
+        rect = ship.meter.original_r
+        Ship(other, other.load_image("ship.png"), ship.p, (ship.thrustkey, ship.leftkey, ship.rightkey, ship.shootkey),
+             (rect.left, rect.top)).kill()
+    restore(other, snapshot(gamestate))
+    return other
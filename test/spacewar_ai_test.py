@@ -0,0 +1,81 @@
+import unittest
+import sys
+
+sys.path.append("../")
+
+
+from spacewar_ai import *  # Computer players
+from spacewar_headless import RandomPilot, play
+
+class TestHeuristicAI(unittest.TestCase):
+
+    def setUp(self):
+        self.ai = HeuristicAI()
+
+    def test_batch_decides_like_one_at_a_time(self):
+        """Deciding for lots of games at once should come out the same as deciding for each ship alone"""
+        fleet = []
+        for seed in range(5):
+            gamestate = headless_gamestate(Config(WALLS=seed % 2))
+            for ship in gamestate.new_game():
+                ship.v = ship.v + (seed - 2, 2 - seed)
+                ship.angle = 70.0 * seed
+                fleet.append((gamestate, ship))
+        batch = self.ai.decide(fleet)
+        self.assertEqual(batch.shape, (10, 4))
+        for row, one in zip(batch.tolist(), fleet):
+            self.assertEqual(row, self.ai.decide([one])[0].tolist())
+
+    def test_leads_the_target(self):
+        """With the enemy crossing in front, the ship should turn to where it's going, not where it is"""
+        gamestate = headless_gamestate(Config(SUN_MASS=0))
+        ship, enemy = gamestate.new_game()
+        ship.p, ship.v = (200, 300), (0, 0)
+        enemy.p, enemy.v = (500, 300), (0, 2)  # Going down the screen
+        decision = self.ai.decide([(gamestate, ship)])[0]
+        self.assertTrue(decision[RIGHT])  # Clockwise, towards the bottom
+        self.assertFalse(decision[SHOOT])
+        t = 300 / math.sqrt(6 ** 2 - 2 ** 2)  # When a shot (at SHOT_SPEED) and the enemy meet
+        ship.angle = -math.degrees(math.atan2(2 * t, 300))
+        self.assertTrue(self.ai.decide([(gamestate, ship)])[0][SHOOT])
+
+    def test_gets_out_of_the_sun(self):
+        """A ship heading into the sun should forget the enemy and burn away from it"""
+        gamestate = headless_gamestate()
+        ship, enemy = gamestate.new_game()
+        ship.p, ship.v, ship.angle = (300, 300), (3, 0), 0.0
+        enemy.p = (200, 300)  # Right behind us
+        decision = self.ai.decide([(gamestate, ship)])[0]
+        self.assertFalse(decision[SHOOT])
+        self.assertTrue(decision[THRUST] or decision[LEFT] or decision[RIGHT])
+
+    def test_goes_for_the_nearest(self):
+        """With lots of ships about, each should go for the one nearest to it"""
+        gamestate = headless_gamestate(Config(SUN_MASS=0))
+        gamestate.new_game()
+        ships = gamestate.fleet
+        for k, x in enumerate((100, 150, 400, 700, 720)):
+            if k >= len(ships):
+                Ship(gamestate, gamestate.load_image("ship.png"), (0, 0), (k, -k, 10 + k, -10 - k), (0, 0))
+            ships[k].p = (x, 300)
+        enemies = self.ai.enemies(gamestate)
+        self.assertEqual([ships.index(enemies[ship]) for ship in ships], [1, 0, 1, 4, 3])
+        ships[4].kill()
+        self.assertEqual(ships.index(self.ai.enemies(gamestate)[ships[3]]), 2)
+
+    def test_beats_random_pilots(self):
+        """The AI should win against a RandomPilot, flying either ship"""
+        self.assertEqual(play((HeuristicAI(), RandomPilot(1)), maxticks=3000)['winner'], 1)
+        self.assertEqual(play((RandomPilot(2), HeuristicAI()), maxticks=3000)['winner'], 2)
+
+class TestDuels(unittest.TestCase):
+
+    def test_duels(self):
+        """Matches played side by side should each end, and the same seed should play out the same"""
+        results = duels(3, seed=1, maxticks=300)
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(result['ticks'] <= 300 for result in results))
+        self.assertEqual(results, duels(3, seed=1, maxticks=300))
+
+if __name__ == "__main__":
+    unittest.main()
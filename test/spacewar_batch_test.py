@@ -0,0 +1,37 @@
+import unittest
+import os
+import sys
+import tempfile
+
+sys.path.append("../")
+
+
+from spacewar_batch import *  # Batches of headless Spacewar matches
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        handle, self.filename = tempfile.mkstemp(suffix='.jsonl')
+        os.close(handle)
+
+    def test_grid_has_every_combination(self):
+        """grid() should produce each combination of the swept values once"""
+        combos = grid({'THRUST': [0.1, 0.2], 'SUN_MASS': [0, 1000, 2500]})
+        self.assertEqual(len(combos), 6)
+        self.assertIn({'THRUST': 0.2, 'SUN_MASS': 0}, combos)
+
+    def test_resume_skips_finished_matches(self):
+        """A second run should only play matches missing from the results file, ignoring a half-written line"""
+        sweeps = {'SUN_MASS': [0, 2500]}
+        self.assertEqual(run_batch(self.filename, sweeps, range(3), maxticks=20, workers=1), 6)
+        lines = open(self.filename).readlines()
+        open(self.filename, 'w').write(''.join(lines[:4]) + lines[4][:10])
+        self.assertEqual(run_batch(self.filename, sweeps, range(3), maxticks=20, workers=1), 2)
+        self.assertEqual(len(finished(self.filename)), 6)
+        self.assertEqual(len(open(self.filename).readlines()), 6)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+if __name__ == "__main__":
+    unittest.main()
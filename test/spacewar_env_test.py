@@ -0,0 +1,66 @@
+import unittest
+import sys
+
+sys.path.append("../")
+
+
+import numpy
+from spacewar_env import *  # Spacewar for training agents in
+from spacewar_ai import HeuristicAI
+
+class TestVectorEnv(unittest.TestCase):
+
+    def play(self, env, steps=60):
+        """Step env with the same made-up actions every time. Returns copies of everything it gave back."""
+        rand = numpy.random.RandomState(1)
+        history = [dict((name, array.copy()) for name, array in env.reset().items())]
+        for k in xrange(steps):
+            obs, rewards, dones, info = env.step(rand.randint(0, 2, env.actions.shape))
+            history.append((obs['ships'].copy(), obs['shots'].copy(), rewards.copy(), dones.copy()))
+        env.close()
+        return history
+
+    def test_arrays_are_reused(self):
+        """step() should hand back the same arrays every time, filled in"""
+        env = VectorEnv(3, maxticks=40)
+        obs = env.reset()
+        self.assertEqual(obs['ships'].shape, (3, 2, len(SHIP_FIELDS)))
+        self.assertEqual(obs['shots'].shape, (3, MAXSHOTS, len(SHOT_FIELDS)))
+        self.assertEqual(list(obs['ships'][0, 0, :2]), [200, 200])
+        shoot = numpy.zeros((3, 2, 4))
+        shoot[:, :, 3] = 1
+        again, rewards, dones, info = env.step(shoot)
+        self.assertIs(again['ships'], obs['ships'])
+        self.assertEqual(list(obs['nshots']), [2, 2, 2])
+        for k in xrange(39):
+            again, rewards, dones, info = env.step(shoot)
+            self.assertIs(again['shots'], obs['shots'])
+        self.assertTrue(dones.all())  # They all ran out of time
+        self.assertEqual(list(obs['nshots']), [0, 0, 0])  # New games
+
+    def test_rewards(self):
+        """Losing energy should cost you, and the enemy losing it should pay"""
+        env = VectorEnv(1, config=Config(SUN_MASS=0))
+        env.reset()
+        gamestate, ships, keystate = env.shards[0].games[0]
+        gamestate.shotpool.acquire(gamestate, ships[1].p)  # Right on top of ship 2
+        obs, rewards, dones, info = env.step(numpy.zeros((1, 2, 4)))
+        self.assertAlmostEqual(rewards[0, 0], float(SHOT_PAIN) / START_ENERGY)
+        self.assertAlmostEqual(rewards[0, 1], -float(SHOT_PAIN) / START_ENERGY)
+        ships[1].meter.decrease(START_ENERGY)  # It dies next tick
+        obs, rewards, dones, info = env.step(numpy.zeros((1, 2, 4)))
+        self.assertTrue(dones[0])
+        self.assertEqual(info['winners'][0], 1)
+        self.assertEqual(list(rewards[0]), [1, -1])
+        self.assertIsNot(env.shards[0].games[0][0], gamestate)  # A new game
+
+    def test_workers_play_the_same_games(self):
+        """Shared out among worker processes, the games should play out exactly as they do in one"""
+        alone = self.play(VectorEnv(4, opponent=HeuristicAI(), maxticks=50))
+        shared = self.play(VectorEnv(4, opponent=HeuristicAI(), maxticks=50, workers=2))
+        for a, b in zip(alone[1:], shared[1:]):
+            for x, y in zip(a, b):
+                self.assertTrue(numpy.array_equal(x, y))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -13,9 +13,9 @@ class TestSun(unittest.TestCase):
 
     def setUp(self):
         pygame.init()
-        testgamestate = GameState()
+        self.testgamestate = GameState()
         screen = pygame.display.set_mode((DISP_WIDTH, DISP_HEIGHT))
-        self.testsun = Sun(testgamestate, load_image("ball.png"), (400,300))
+        self.testsun = Sun(self.testgamestate, load_image("ball.png"), (400,300))
 
     def test_sun_has_mass_by_default(self):
         """Sun should have a mass greater than zero"""
@@ -28,16 +28,287 @@ class TestShip(unittest.TestCase):
 
     def setUp(self):
         pygame.init()
-        testgamestate = GameState()
+        self.testgamestate = GameState()
         screen = pygame.display.set_mode((DISP_WIDTH, DISP_HEIGHT))
-        self.testsun = Sun(testgamestate, load_image("ball.png"), (400,300))
+        self.testsun = Sun(self.testgamestate, load_image("ball.png"), (400,300))
 
     def test_ship_cant_shoot_after_death(self):
         """Ship should be unable to fire after it dies"""
-        pass
+        gamestate = self.testgamestate
+        gamestate.load_sounds()
+        ship = Ship(gamestate, load_image("ship.png"), (200,200), SHIP1_KEYS, (10,10))
+        ship.meter.decrease(START_ENERGY)
+        keystate = dict.fromkeys(SHIP1_KEYS, 0)
+        gamestate.step(keystate)  # It dies, and leaves 4 shots behind
+        self.assertFalse(ship.alive())
+        keystate[ship.shootkey] = 1
+        gamestate.step(keystate)
+        self.assertEqual(len(gamestate.bodys), 5)  # The sun and the 4 shots
+        self.assertEqual(ship.shotsfired, 0)
+
+    def test_dead_ships_flames_go_out(self):
+        """A ship that dies with its thrust on shouldn't leave its flame behind"""
+        gamestate = self.testgamestate
+        gamestate.load_sounds()
+        ship = Ship(gamestate, load_image("ship.png"), (200,200), SHIP1_KEYS, (10,10))
+        keystate = dict.fromkeys(SHIP1_KEYS, 0)
+        keystate[ship.thrustkey] = 1
+        gamestate.step(keystate)
+        self.assertIn(ship.flame, gamestate.flames)
+        ship.meter.decrease(START_ENERGY)
+        gamestate.step(keystate)
+        self.assertFalse(ship.alive())
+        self.assertNotIn(ship.flame, gamestate.flames)
+
+    def test_game_states_are_separate(self):
+        """Bodys and settings in one GameState shouldn't show up in another"""
+        other = GameState(Config(SUN_MASS=1))
+        othersun = Sun(other, load_image("ball.png"), (400,300))
+        self.assertEqual(len(self.testgamestate.bodys), 1)
+        self.assertEqual(len(other.bodys), 1)
+        self.assertEqual(othersun.mass, 1)
+        self.assertEqual(self.testsun.mass, SUN_MASS)
+
+    def test_bodies_have_no_dicts(self):
+        """Bodys keep everything in __slots__, and share the World's edges"""
+        import gc
+        gamestate = GameState()
+        gamestate.load_sounds()
+        ship, othership = gamestate.new_game()
+        gamestate.step(dict.fromkeys(SHIP1_KEYS + SHIP2_KEYS, 1))
+        for sprite in gamestate.bodys.sprites() + [ship.flame, ship.meter]:
+            instance_dicts = [d for d in gc.get_referents(sprite) if isinstance(d, dict) and ('image' in d or 'value' in d)]
+            self.assertEqual(instance_dicts, [])
+        self.assertTrue(ship.area is othership.area is gamestate.world.area)
+
+    def tearDown(self):
+        pygame.quit()
+
+class TestAssets(unittest.TestCase):
+
+    def setUp(self):
+        pygame.init()
+        screen = pygame.display.set_mode((DISP_WIDTH, DISP_HEIGHT))
+        self.assets = Assets()
+
+    def test_images_are_loaded_once(self):
+        """After preloading, images, ship rotations and explosion sizes should all be ready-made"""
+        self.assets.preload(SHIP_ROTATE)
+        misses = self.assets.misses
+        ship, rect = self.assets.image("ship.png")
+        self.assertIs(ship, self.assets.image("ship.png")[0])
+        self.assertIsNot(rect, self.assets.image("ship.png")[1])
+        self.assets.rotated(ship, 3 * SHIP_ROTATE % 360.0)
+        self.assets.scaled(self.assets.image("flame.png")[0], (6, 6))
+        self.assertEqual(self.assets.misses, misses)
+
+    def test_headless_assets_are_just_rectangles(self):
+        """Headless assets should have no image, but the right size"""
+        image, rect = Assets(headless=True).image("ball.png")
+        self.assertIsNone(image)
+        self.assertEqual(rect.size, self.assets.image("ball.png")[1].size)
 
     def tearDown(self):
         pygame.quit()
 
+class TestPool(unittest.TestCase):
+
+    def setUp(self):
+        self.gamestate = GameState(Config(POOL_SIZE=2, POOL_OVERFLOW='drop'), headless=True)
+        self.pool = self.gamestate.shotpool
+
+    def test_dead_shots_are_reused(self):
+        """A shot that has died should be the next one fired"""
+        self.pool.fill(self.gamestate)
+        shot = self.pool.acquire(self.gamestate, (100,100), (1,0))
+        self.assertEqual(shot.timeleft, SHOT_LIFESPAN)
+        shot.kill()
+        self.assertIs(self.pool.acquire(self.gamestate, (200,200)), shot)
+        self.assertEqual(list(shot.p), [200, 200])
+        self.assertEqual(self.pool.allocations, 2)
+        self.assertEqual(self.pool.hits, 2)
+
+    def test_overflow(self):
+        """A full pool should drop, recycle the oldest shot, or grow, as told"""
+        first = self.pool.acquire(self.gamestate, (100,100))
+        second = self.pool.acquire(self.gamestate, (100,100))
+        self.assertIsNone(self.pool.acquire(self.gamestate, (100,100)))
+        self.assertEqual(self.pool.drops, 1)
+        self.pool.overflow = 'recycle'
+        self.assertIs(self.pool.acquire(self.gamestate, (300,300)), first)
+        self.assertEqual(len(self.gamestate.bodys), 2)
+        self.pool.overflow = 'grow'
+        extra = self.pool.acquire(self.gamestate, (100,100))
+        self.assertEqual(len(self.gamestate.bodys), 3)
+        extra.kill()
+        self.assertEqual(len(self.pool), 2)
+        empty = Pool(Shot.blank, 0, 'recycle')
+        self.assertIsNotNone(empty.acquire(self.gamestate, (100,100)))
+
+class Mine(Body):
+    __slots__ = ()
+
+class TestCollisionTable(unittest.TestCase):
+
+    def test_new_kinds_of_body(self):
+        """A new kind of Body should only need registering, and get its collisions either way round"""
+        gamestate = GameState(headless=True)
+        gamestate.load_sounds()
+        gamestate.responses = table = CollisionTable()
+        hits = []
+        table.register(Ship, Mine, lambda gamestate, ship, mine: hits.append((ship, mine)))
+        mine = Mine(gamestate, gamestate.load_image("shot.png"), (200,200))  # Gets the lower slot
+        ship = Ship(gamestate, gamestate.load_image("ship.png"), (200,205), SHIP1_KEYS, (10,10))
+        gamestate.collide()
+        self.assertEqual(hits, [(ship, mine)])
+        self.assertEqual(gamestate.hits, {('Ship', 'Mine'): 1})
+        self.assertEqual(RESPONSES.respond(gamestate, numpy.array([mine.slot]), numpy.array([ship.slot])), {})
+
+class TestRenderer(unittest.TestCase):
+
+    def setUp(self):
+        pygame.init()
+        self.screen = pygame.display.set_mode((DISP_WIDTH, DISP_HEIGHT))
+        self.gamestate = GameState()
+        self.gamestate.load_sounds()
+        self.gamestate.new_game()
+        self.renderer = Renderer(self.screen, pygame.Surface(self.screen.get_size()))
+        self.renderer.start()
+
+    def test_only_changes_are_updated(self):
+        """After the first frame, only the moving sprites should be updated"""
+        self.renderer.draw(self.gamestate)
+        self.gamestate.step(dict.fromkeys(SHIP1_KEYS + SHIP2_KEYS, 0))
+        self.renderer.draw(self.gamestate)
+        self.assertGreater(self.renderer.dirtyarea, 0)
+        self.assertLess(self.renderer.dirtyarea, DISP_WIDTH * DISP_HEIGHT / 10)
+        self.assertEqual(self.renderer.flips, 0)
+
+    def test_busy_frames_flip(self):
+        """When most of the screen changed, the whole screen should be flipped"""
+        self.renderer.threshold = 0
+        self.renderer.draw(self.gamestate)
+        self.assertEqual(self.renderer.flips, 1)
+
+    def tearDown(self):
+        pygame.quit()
+
+class TestCamera(unittest.TestCase):
+
+    def setUp(self):
+        self.camera = Camera((800, 600), pygame.Rect(0, 0, 4000, 3000))
+
+    def test_zoom_and_pan(self):
+        """Zooming should go in steps, from showing all the world to close up, and panning stop at the edges"""
+        camera = self.camera
+        camera.fit()
+        self.assertAlmostEqual(camera.scale, 0.5 ** 2.5)  # The first step 4000 fits into 800 at
+        self.assertEqual(list(camera.to_screen(numpy.array([(2000, 1500), (0, 0)]))[0]), [400, 300])
+        camera.zoom(-1)
+        self.assertAlmostEqual(camera.scale, 0.5 ** 2.5)  # No further out
+        camera.zoom(5)
+        self.assertAlmostEqual(camera.scale, 1)
+        camera.zoom(5)
+        self.assertAlmostEqual(camera.scale, 2)
+        camera.pan(-100, 10)
+        self.assertEqual(camera.center, (1950, 1505))
+        camera.pan(-10000, 10000)
+        self.assertEqual(camera.center, (0, 3000))
+        self.assertEqual(list(camera.to_screen(numpy.array([(10, 2990)]))[0]), [420, 280])
+
+    def test_only_whats_on_the_screen_is_drawn(self):
+        """Bodys the camera can't see shouldn't be drawn"""
+        pygame.init()
+        screen = pygame.display.set_mode((800, 600))
+        gamestate = GameState(Config(WORLD_WIDTH=4000, WORLD_HEIGHT=3000))
+        gamestate.load_sounds()
+        ships = gamestate.new_game()
+        renderer = CameraRenderer(screen, pygame.Surface(screen.get_size()), self.camera, ships)
+        renderer.draw(gamestate)
+        self.assertEqual(renderer.drawn, 1)  # Just the sun, in the middle of the world
+        self.camera.fit()
+        renderer.draw(gamestate, 0.5)
+        self.assertEqual(renderer.drawn, 3)
+        pygame.quit()
+
+class TestFixedTimestep(unittest.TestCase):
+
+    def test_ticks_keep_time(self):
+        """Ticks should come at the tick rate whatever the frame rate, and drop out when too far behind"""
+        clock = [0.0]
+        timestep = FixedTimestep(32, maxticks=5, timer=lambda: clock[0])  # Powers of two add up exactly
+        ticks = []
+        for frame in range(66):  # A second and a frame, at 64 frames a second
+            ticks.append(timestep.ticks())
+            clock[0] += 1 / 64.0
+        self.assertEqual(sum(ticks), 32)
+        self.assertEqual(max(ticks), 1)
+        self.assertEqual(timestep.alpha, 0.5)
+        clock[0] += 1.0  # A very slow frame
+        self.assertEqual(timestep.ticks(), 5)
+        self.assertEqual(timestep.dropped, 28)  # 33 ticks due, counting the frame before
+
+    def test_interpolation(self):
+        """Between ticks, sprites should be drawn between where they were and where they are"""
+        gamestate = GameState(headless=True)
+        gamestate.load_sounds()
+        shot = gamestate.shotpool.acquire(gamestate, (100, 100), (4, 0))
+        gamestate.step(dict.fromkeys(SHIP1_KEYS + SHIP2_KEYS, 0))
+        self.assertEqual(shot.rect.center, (104, 100))
+        gamestate.interpolate(0.5)
+        self.assertEqual(shot.rect.center, (102, 100))
+
+class TestStartup(unittest.TestCase):
+
+    def test_timer(self):
+        """Each lap should be charged the time since the last one, and background steps the time since the start"""
+        clock = [1.0]
+        timer = StartupTimer(0.5, timer=lambda: clock[0])
+        timer.lap('imports')
+        clock[0] = 1.25
+        timer.done('sounds')
+        clock[0] = 2.0
+        timer.lap('display')
+        self.assertEqual(timer.laps, [('imports', 0.5), ('display', 1.0)])
+        self.assertEqual(timer.background, [('sounds', 0.75)])
+        self.assertEqual(timer.total(), 1.5)
+        self.assertEqual(len(timer.report()), 4)
+
+    def test_sounds_load_in_the_background(self):
+        """Sounds should be silent until the thread loading them has finished"""
+        pygame.display.init()
+        gamestate = GameState()
+        loaded = []
+        thread = gamestate.load_sounds(background=True, done=lambda: loaded.append(1))
+        self.assertEqual(sorted(gamestate.soundplay), sorted(SOUNDS))
+        thread.join()
+        self.assertEqual(loaded, [1])
+        self.assertIsNone(GameState(headless=True).load_sounds(background=True))
+        pygame.quit()
+
+    def test_headless_images_arent_decoded(self):
+        """A PNG's size should come from its header, and match the image's"""
+        self.assertEqual(image_size(os.path.join('data', 'ship.png')), pygame.image.load(os.path.join('data', 'ship.png')).get_size())
+
+class TestProfiler(unittest.TestCase):
+
+    def test_phases_and_percentiles(self):
+        """Each lap should be charged to its phase, and percentiles taken over recent frames"""
+        clock = [0.0]
+        profiler = Profiler(window=100, timer=lambda: clock[0])
+        for frame in range(100):
+            profiler.begin()
+            clock[0] += 0.001
+            profiler.lap('collide')
+            clock[0] += 0.001 * frame
+            profiler.lap('draw')
+            profiler.count('bodies', frame)
+            profiler.endframe()
+        self.assertAlmostEqual(profiler.percentiles('collide')[0], 0.001)
+        self.assertAlmostEqual(profiler.percentiles('draw', (50,))[0], 0.0495)
+        self.assertEqual(profiler.names, ['collide', 'draw', 'bodies'])
+        self.assertEqual(len(profiler.trace), 100)
+        self.assertEqual(len(profiler.report()), 4)
+
 if __name__ == "__main__":
     unittest.main()
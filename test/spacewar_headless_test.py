@@ -0,0 +1,24 @@
+import unittest
+import sys
+
+sys.path.append("../")
+
+
+from spacewar_headless import *  # Spacewar without a screen
+
+class TestHeadless(unittest.TestCase):
+
+    def test_same_seed_same_match(self):
+        """Two headless matches with the same seed should play out the same"""
+        self.assertEqual(play(seed=3, maxticks=500), play(seed=3, maxticks=500))
+
+    def test_match_stops_at_maxticks(self):
+        """A match nobody wins should stop after maxticks, as a draw"""
+        idle = lambda ship, gamestate, keystate: None
+        result = play(pilots=(idle, idle), maxticks=50)
+        self.assertEqual(result['ticks'], 50)
+        self.assertEqual(result['winner'], 0)
+        self.assertEqual(result['shots'], [0, 0])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,214 @@
+import unittest
+import random
+import sys
+
+sys.path.append("../")
+
+
+import numpy
+import pygame
+from spacewar_physics import *  # My Spacewar physics
+
+def step(world, walls, maxspeed):
+    """Move world one tick the way GameState does, with no gravity"""
+    SemiImplicitEuler().advance(world, walls, maxspeed, lambda: None)
+
+class TestWorld(unittest.TestCase):
+
+    def setUp(self):
+        self.world = World(pygame.Rect(0, 0, 800, 600), capacity=2)
+
+    def test_step_moves_bodies(self):
+        """A step should add acceleration to velocity and velocity to position"""
+        slot = self.world.add(None, (100, 100), (2, 3))
+        self.world.a[slot] = (1, 1)
+        step(self.world, 1, 30)
+        self.assertEqual(list(self.world.v[slot]), [3, 4])
+        self.assertEqual(list(self.world.p[slot]), [103, 104])
+        self.assertEqual(list(self.world.a[slot]), [0, 0])
+
+    def test_walls_bounce(self):
+        """With walls, a body crossing the left wall should be reflected"""
+        slot = self.world.add(None, (12, 300), (-5, 0), radius=10)
+        step(self.world, 1, 30)
+        self.assertEqual(list(self.world.v[slot]), [5, 0])
+        self.assertEqual(self.world.p[slot][0], 13)
+
+    def test_toroidal_wrap(self):
+        """Without walls, a body leaving the right edge should reappear on the left"""
+        slot = self.world.add(None, (798, 300), (5, 0), radius=10)
+        step(self.world, 0, 30)
+        self.assertEqual(self.world.p[slot][0], 0)
+
+    def test_speed_limit(self):
+        """No body should go faster than maxspeed"""
+        slot = self.world.add(None, (400, 300), (30, 40))
+        step(self.world, 1, 5)
+        self.assertAlmostEqual(self.world.v[slot][0], 3)
+        self.assertAlmostEqual(self.world.v[slot][1], 4)
+
+    def test_slots_are_reused_and_grown(self):
+        """Dead slots should be handed out again, and the world should grow when full"""
+        a = self.world.add(None, (0, 0))
+        b = self.world.add(None, (0, 0))
+        self.world.remove(a)
+        self.assertEqual(self.world.add(None, (0, 0)), a)
+        c = self.world.add(None, (0, 0))
+        self.assertEqual(self.world.capacity(), 4)
+        self.assertEqual(len(self.world), 3)
+        self.assertNotIn(c, (a, b))
+
+    def test_fast_shots_dont_skip_through(self):
+        """A shot flying through a sun in one step should only hit it when swept"""
+        sun = self.world.add(None, (400, 300), radius=20)
+        shot = self.world.add(None, (370, 300), (60, 0), radius=2)
+        step(self.world, 1, 100)
+        i, j = numpy.array([shot]), numpy.array([sun])
+        self.assertFalse(self.world.touching(i, j, 1)[0])
+        self.world.swept = True
+        self.assertTrue(self.world.touching(i, j, 1)[0])
+        self.assertAlmostEqual(self.world.impacts(i, j, 1)[0], 8 / 60.0)
+
+    def test_bodies_bouncing_apart_dont_collide_again(self):
+        """Swept Bodys that only touched at the start of the step were already dealt with"""
+        self.world.swept = True
+        a = self.world.add(None, (400, 300), radius=20)
+        b = self.world.add(None, (421, 300), (3, 0), radius=2)
+        step(self.world, 1, 30)
+        self.assertFalse(self.world.touching(numpy.array([b]), numpy.array([a]), 1)[0])
+
+class TestBroadPhase(unittest.TestCase):
+
+    def setUp(self):
+        rand = random.Random(1)
+        self.world = World(pygame.Rect(0, 0, 800, 600))
+        for k in range(300):
+            self.world.add(None, (rand.uniform(0, 800), rand.uniform(0, 600)), radius=rand.choice((2, 2, 2, 12)))
+        self.world.add(None, (400, 300), radius=20)
+
+    def touching_pairs(self, phase, walls):
+        i, j = phase.pairs(self.world, walls)
+        hit = self.world.touching(i, j, walls)
+        return sorted(zip(numpy.minimum(i, j)[hit], numpy.maximum(i, j)[hit]))
+
+    def test_broad_phases_find_every_collision(self):
+        """Grid and sweep-and-prune should find the same collisions as checking every pair"""
+        for walls in (1, 0):
+            expected = self.touching_pairs(BruteForce(), walls)
+            self.assertTrue(expected)
+            self.assertEqual(self.touching_pairs(GridBroadPhase(), walls), expected)
+            self.assertEqual(self.touching_pairs(SweepAndPrune(), walls), expected)
+
+    def test_broad_phases_find_every_swept_collision(self):
+        """The broad phases should cover the whole of every fast Body's path"""
+        rand = random.Random(3)
+        for slot in self.world.live():
+            self.world.v[slot] = (rand.uniform(-30, 30), rand.uniform(-30, 30))
+        self.world.swept = True
+        for walls in (1, 0):
+            step(self.world, walls, 30)
+            expected = self.touching_pairs(BruteForce(), walls)
+            self.assertEqual(self.touching_pairs(GridBroadPhase(), walls), expected)
+            self.assertEqual(self.touching_pairs(SweepAndPrune(), walls), expected)
+
+    def test_pairs_come_in_the_same_order(self):
+        """Every broad phase should give the touching pairs in slot order, lower slot first"""
+        for walls in (1, 0):
+            found = []
+            for phase in (BruteForce(), GridBroadPhase(), SweepAndPrune()):
+                i, j = phase.pairs(self.world, walls)
+                hit = self.world.touching(i, j, walls)
+                found.append((i[hit].tolist(), j[hit].tolist()))
+            self.assertEqual(found[1], found[0])
+            self.assertEqual(found[2], found[0])
+
+    def test_wrapped_collisions_cross_the_edges(self):
+        """Without walls, bodies on opposite edges should touch"""
+        a = self.world.add(None, (1, 1), radius=2)
+        b = self.world.add(None, (799, 599), radius=2)
+        for phase in (GridBroadPhase(), SweepAndPrune()):
+            self.assertIn((a, b), self.touching_pairs(phase, 0))
+            self.assertNotIn((a, b), self.touching_pairs(phase, 1))
+
+class TestGravity(unittest.TestCase):
+
+    def setUp(self):
+        rand = random.Random(2)
+        self.world = World(pygame.Rect(0, 0, 800, 600))
+        for k in range(200):
+            self.world.add(None, (rand.uniform(0, 800), rand.uniform(0, 600)), radius=2)
+        self.world.add(None, (400, 300), mass=2500, radius=20)
+        self.world.add(None, (400, 310), radius=2)  # Touching the sun, so not pulled by it
+
+    def pulls(self, gravity):
+        self.world.a[:] = 0
+        gravity.apply(self.world, 0.01)
+        return self.world.a[self.world.live()].copy()
+
+    def expected(self):
+        """The pulls, worked out one pair at a time like Body.pulledby()"""
+        w, live = self.world, self.world.live()
+        a = numpy.zeros((len(live), 2))
+        for n, s in enumerate(live):
+            for b in live:
+                r = w.p[b] - w.p[s]
+                d2 = (r * r).sum()
+                if d2 > (w.radius[s] + w.radius[b]) ** 2:
+                    a[n] += 0.01 * w.mass[b] / d2 * r
+        return a
+
+    def test_all_pairs_is_exact(self):
+        """AllPairsGravity should match working out every pull one at a time"""
+        gravity = AllPairsGravity()
+        self.assertTrue(numpy.allclose(self.pulls(gravity), self.expected()))
+        self.assertEqual(gravity.evaluations, 202 * 202)
+
+    def test_barnes_hut(self):
+        """Barnes-Hut should be exact at theta 0, and close with fewer evaluations otherwise"""
+        self.assertTrue(numpy.allclose(self.pulls(BarnesHutGravity(0)), self.expected()))
+        gravity = BarnesHutGravity(0.5)
+        self.assertTrue(numpy.allclose(self.pulls(gravity), self.expected(), rtol=0.05, atol=1e-4))
+        self.assertLess(gravity.evaluations, 202 * 202 / 2)
+
+    def test_massive_only(self):
+        """MassiveGravity should only count the sun's pull, and not on anything touching it"""
+        gravity = MassiveGravity(100)
+        pulls = self.pulls(gravity)
+        self.assertEqual(gravity.evaluations, 202)
+        self.assertLess(abs(pulls - self.expected()).max(), 0.01)
+        self.assertEqual(list(pulls[-1]), [0, 0])
+
+class TestIntegrators(unittest.TestCase):
+
+    def orbit(self, integrator, ticks=300):
+        """Send a body round a sun in a circle. Returns how far its energy drifted, and the world"""
+        world = World(pygame.Rect(0, 0, 800, 600))
+        world.add(None, (400, 300), mass=2500, radius=20)
+        world.add(None, (460, 300), (0, 5), radius=2)  # sqrt(0.01 * 2500): a circle, at any distance
+        gravity = MassiveGravity(100)
+        start = energy(world, 0.01, 100)
+        for k in range(ticks):
+            integrator.advance(world, 1, 30, lambda: gravity.apply(world, 0.01))
+        return abs(energy(world, 0.01, 100) - start), world
+
+    def test_energy_drift(self):
+        """Euler's energy should drift away; semi-implicit Euler's less, and leapfrog's hardly at all"""
+        euler = self.orbit(Euler())[0]
+        symplectic = self.orbit(SemiImplicitEuler())[0]
+        leapfrog = self.orbit(Leapfrog())[0]
+        self.assertLess(symplectic, euler / 10)
+        self.assertLess(leapfrog, symplectic / 10)
+
+    def test_substeps(self):
+        """Substeps should make for a truer orbit, and be added where needed"""
+        leapfrog = Leapfrog(4)
+        drift, world = self.orbit(leapfrog)
+        self.assertEqual(leapfrog.evaluations, 5)
+        self.assertLess(drift, self.orbit(Leapfrog())[0])
+        self.assertAlmostEqual(numpy.hypot(*(world.p[1] - world.p[0])), 60, 0)
+        adaptive = Leapfrog(1, courant=0.01)
+        self.orbit(adaptive, 1)
+        self.assertEqual(adaptive.used, 13)  # 5 / (0.01 * (60 - 20)) = 12.5, so 13 steps
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+import sys, os, tempfile
+
+sys.path.append("../")
+
+
+from spacewar_replay import *  # Recording and replaying games
+from spacewar_headless import RandomPilot
+
+class TestReplay(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.filename = tempfile.mkstemp('.swr')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def record(self, ticks=300, **settings):
+        """Play a headless match between RandomPilots, recording it"""
+        gamestate = headless_gamestate(Config(**settings))
+        ships = gamestate.new_game()
+        pilots = (RandomPilot(1), RandomPilot(2))
+        recorder = Recorder(gamestate.config)
+        keystate = KeyState()
+        for tick in xrange(ticks):
+            for ship, pilot in zip(ships, pilots):
+                pilot(ship, gamestate, keystate)
+            recorder.record(keystate)
+            gamestate.step(keystate)
+        recorder.save(self.filename, gamestate)
+        return recorder, gamestate
+
+    def test_replay_ends_up_in_the_same_place(self):
+        """Replaying a recording should give exactly the state it was recorded with"""
+        recorder, recorded = self.record(SUN_MASS=2000, WALLS=0)
+        gamestate, rate, ok = replay(self.filename)
+        self.assertTrue(ok)
+        self.assertEqual(gamestate.config.SUN_MASS, 2000)
+        self.assertEqual([ship.shotsfired for ship in gamestate.ships],
+                         [ship.shotsfired for ship in recorded.ships])
+
+    def test_replay_notices_a_difference(self):
+        """A recording that's been tampered with shouldn't match"""
+        recorder, recorded = self.record()
+        recorder.ticks[10] = recorder.ticks[10] ^ 0xff
+        recorder.save(self.filename, recorded)
+        self.assertFalse(replay(self.filename)[2])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+import sys
+
+sys.path.append("../")
+
+
+from spacewar_scenario import *  # Games set up from files
+from spacewar_ai import HeuristicAI
+from spacewar_replay import checksum
+
+SCENARIO = {'settings': {'WORLD_WIDTH': 2000, 'WORLD_HEIGHT': 1500, 'WALLS': 0},
+            'suns': [{'p': [500, 500], 'mass': 4000}, {'p': [1500, 1000]}],
+            'ships': [{'p': [100, 100], 'angle': 90, 'player': 1},
+                      {'count': 10, 'seed': 1, 'speed': 2}],
+            'shots': [{'count': 300, 'seed': 2, 'speed': 3, 'margin': 50, 'timeleft': 400}]}
+
+class TestScenario(unittest.TestCase):
+
+    def build(self):
+        gamestate = headless_gamestate(configure(SCENARIO))
+        ships, players = build(gamestate, SCENARIO)
+        return gamestate, ships, players
+
+    def test_everything_is_there(self):
+        """The world should be the size it says, with every sun, ship and shot in it, out of the suns"""
+        gamestate, ships, players = self.build()
+        world = gamestate.world
+        self.assertEqual((world.area.width, world.area.height), (2000, 1500))
+        self.assertEqual(len(ships), 11)
+        self.assertEqual(len(gamestate.bodys), 2 + 11 + 300)
+        self.assertEqual(players, [ships[0], None])
+        self.assertEqual(ships[0].angle, 90)
+        self.assertEqual(ships[0].thrustkey, SHIP1_KEYS[0])
+        keys = set()
+        for ship in ships[1:]:
+            keys.update((ship.thrustkey, ship.leftkey, ship.rightkey, ship.shootkey))
+        self.assertEqual(len(keys), 40)  # Nobody else's
+        suns = [body for body in gamestate.bodys if isinstance(body, Sun)]
+        self.assertEqual(sorted(sun.mass for sun in suns), [SUN_MASS, 4000])
+        for body in gamestate.bodys:
+            if isinstance(body, Shot):
+                self.assertEqual(body.timeleft, 400)
+            if not isinstance(body, Sun):
+                for sun in suns:
+                    self.assertGreater(dist_sqrd(body.p, sun.p), (sun.radius + 50) ** 2)
+
+    def test_same_scenario_same_game(self):
+        """Built twice and flown by the AI, a scenario should play out exactly the same"""
+        sums = []
+        for k in range(2):
+            gamestate, ships, players = self.build()
+            ai, keystate = HeuristicAI(), KeyState()
+            for tick in xrange(30):
+                fleet = [(gamestate, ship) for ship in gamestate.ships.sprites()]
+                ai.fly(fleet, [keystate] * len(fleet))
+                gamestate.step(keystate)
+            sums.append(checksum(gamestate))
+        self.assertEqual(sums[0], sums[1])
+
+    def test_bad_scenarios(self):
+        """A Body with nowhere to go, or a setting that doesn't exist, should be an error"""
+        self.assertRaises(TypeError, configure, {'settings': {'WORLD_SIZE': 10}})
+        gamestate = headless_gamestate()
+        crowded = {'suns': [{'p': [400, 300]}], 'shots': [{'count': 10, 'margin': 1000}]}
+        self.assertRaises(ValueError, build, gamestate, crowded)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+import sys
+
+sys.path.append("../")
+
+
+from spacewar_snapshot import *  # Saving and restoring games
+from spacewar_headless import KeyState, RandomPilot, headless_gamestate
+from spacewar_replay import checksum
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.gamestate = headless_gamestate()
+        self.ships = self.gamestate.new_game()
+        pilots = (RandomPilot(1), RandomPilot(2))
+        self.keys = []  # The keys held down each tick
+        for k in xrange(120):
+            keystate = KeyState()
+            for ship, pilot in zip(self.ships, pilots):
+                pilot(ship, self.gamestate, keystate)
+            self.keys.append(keystate)
+
+    def play(self, gamestate, first, last):
+        for keystate in self.keys[first:last]:
+            gamestate.step(keystate)
+        return checksum(gamestate)
+
+    def test_restored_games_play_on_the_same(self):
+        """After a restore, the same keys should end up in exactly the same place"""
+        self.play(self.gamestate, 0, 60)
+        data = snapshot(self.gamestate)
+        shots = len(self.gamestate.bodys)
+        self.assertGreater(shots, 3)  # Shots in the air, not just the ships and the sun
+        end = self.play(self.gamestate, 60, 120)
+        restore(self.gamestate, data)
+        self.assertEqual(len(self.gamestate.bodys), shots)
+        self.assertEqual(self.play(self.gamestate, 60, 120), end)
+
+    def test_forks_are_separate(self):
+        """A fork should carry on like the original, without changing it"""
+        self.play(self.gamestate, 0, 60)
+        before = checksum(self.gamestate)
+        other = fork(self.gamestate)
+        self.assertEqual(checksum(other), before)
+        forked = self.play(other, 60, 120)
+        self.assertEqual(checksum(self.gamestate), before)
+        self.assertEqual(self.play(self.gamestate, 60, 120), forked)
+        self.assertIsNot(other.fleet[0], self.ships[0])
+
+    def test_dead_ships_come_back(self):
+        """Restoring from before a ship died should bring it back to life, with its energy"""
+        ship = self.ships[1]
+        data = snapshot(self.gamestate, compress=True)
+        self.assertLess(len(data), len(snapshot(self.gamestate)))
+        ship.meter.decrease(START_ENERGY)
+        self.gamestate.step(KeyState())
+        self.assertFalse(ship.alive())
+        restore(self.gamestate, data)
+        self.assertTrue(ship.alive())
+        self.assertEqual(ship.meter.value, START_ENERGY)
+        self.assertEqual(self.gamestate.ships.sprites(), list(self.ships))
+        self.assertRaises(ValueError, restore, self.gamestate, 'SWREC1\n' + data[7:])
+
+    def test_fractional_energy_comes_back(self):
+        """Pains and shot delays that aren't whole numbers should come back as they were"""
+        gamestate = headless_gamestate(Config(CRASH_PAIN=2.5, SHOT_PAIN=2.5, SHOT_DELAY=4.5))
+        ships = gamestate.new_game()
+        ships[0].meter.decrease(gamestate.config.SHOT_PAIN)
+        keystate = KeyState()
+        keystate[ships[1].shootkey] = 1
+        gamestate.step(keystate)
+        data = snapshot(gamestate)
+        before = checksum(gamestate)
+        ships[0].meter.decrease(gamestate.config.CRASH_PAIN)
+        gamestate.step(keystate)
+        restore(gamestate, data)
+        self.assertEqual(ships[0].meter.value, START_ENERGY - 2.5)
+        self.assertEqual(ships[1].meter.value, START_ENERGY)
+        self.assertEqual(repr(ships[1].cantshoot), repr(gamestate.config.SHOT_DELAY - 1))
+        self.assertEqual(checksum(gamestate), before)
+
+if __name__ == "__main__":
+    unittest.main()